@@ -0,0 +1,79 @@
+import json
+import os
+import shlex
+import time
+
+from node_stats import MIN_WEIGHT, NodeSummary
+
+REMOTE_AGGREGATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remote_aggregation.py")
+
+
+class AggregationStore(object):
+    # Shares node summaries between users through one JSON file per user in a shared directory. Every exchange is a
+    # single remote call (remote_aggregation.py) that publishes our file and returns only the peer files that changed
+    # since the last exchange; unchanged peers are served from the local cache.
+    # Summaries go to <username>_node_summary.json. Monitors that predate them publish raw speed lists to
+    # <username>_node_info.json and never look at summary files, so both are read but only summaries are written
+    def __init__(self, transport, path, username, logging_mode="s/it", half_life=600.0):
+        self.transport = transport
+        self.path = path
+        self.username = username
+        self.logging_mode = logging_mode
+        self.half_life = half_life
+        # Peer file path -> (mtime, {node: NodeSummary already converted to our logging mode})
+        self.cache = {}
+        with open(REMOTE_AGGREGATION_PATH, "rb") as f:
+            self.script = f.read()
+
+    def exchange(self, node_summaries):
+        spec = {
+            "path": self.path,
+            "own_name": f"{self.username}_node_summary.json",
+            "patterns": ["*_node_summary.json", "*_node_info.json"],
+            "node_info": {"logging_mode": self.logging_mode,
+                          "nodes": {node: summary.to_dict() for node, summary in node_summaries.items()}},
+            "known": {path: mtime for path, (mtime, _) in self.cache.items()},
+        }
+        output = self.transport.run(f"python3 - {shlex.quote(json.dumps(spec))}", input=self.script,
+                                    label="aggregation")
+        if not output:
+            raise RuntimeError(f"No aggregation data returned from {self.path}")
+        response = json.loads(output.decode("utf-8"))
+
+        # Forget peers whose file disappeared, refresh the ones that changed
+        self.cache = {path: cached for path, cached in self.cache.items()
+                      if path in response["files"] and path not in response["changed"]}
+        with self.transport.metrics.time("merge nodes"):
+            for path, node_info in response["changed"].items():
+                mtime = response["files"][path]
+                self.cache[path] = (mtime, self.convert(node_info, mtime))
+            return self.merge(node_summaries)
+
+    def convert(self, node_info, mtime):
+        # Convert to standard set in current execution: s/it or it/s
+        import numpy as np
+        logging_mode = node_info.pop("logging_mode", self.logging_mode)
+        if "nodes" in node_info:
+            summaries = {node: NodeSummary.from_dict(data, half_life=self.half_life)
+                         for node, data in node_info["nodes"].items()}
+            if logging_mode != self.logging_mode:
+                summaries = {node: summary.invert() for node, summary in summaries.items()}
+            return summaries
+
+        # Raw speed lists from an older monitor: one array operation per node, stamped with the file's mtime
+        speeds = {node: np.asarray(values, dtype=np.float64) for node, values in node_info.items()}
+        if logging_mode != self.logging_mode:
+            with np.errstate(divide="ignore"):
+                speeds = {node: 1 / values for node, values in speeds.items()}
+        return {node: NodeSummary.from_values(values, half_life=self.half_life, updated=mtime)
+                for node, values in speeds.items()}
+
+    def merge(self, node_summaries):
+        # Aggregate summaries for all users: our own plus every cached peer, each decayed by its age
+        now = time.time()
+        merged = {node: summary.copy() for node, summary in node_summaries.items()}
+        for _, summaries in self.cache.values():
+            for node, summary in summaries.items():
+                merged.setdefault(node, NodeSummary(half_life=self.half_life, updated=now)).merge(summary, now)
+        # Like our own nodes, nodes nobody has had a running job on for several half-lives drop out
+        return {node: summary for node, summary in merged.items() if summary.decay(now).count >= MIN_WEIGHT}
@@ -0,0 +1,192 @@
+import json
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.request import Request, urlopen
+
+# Levels that raise an alert by default. Job errors are split by their message: "failed" (job or fetch failed),
+# "pending", "not found" and "started" (no speed matches yet)
+ALERT_LEVELS = ("worrying", "extreme", "failed")
+
+
+def alert_level(level, message):
+    if level != "error":
+        return level
+    for name in ("failed", "pending", "not found", "started"):
+        if name in message.lower():
+            return name
+    return "error"
+
+
+class FileSink(object):
+    # One JSON object per line, appended to a file ("-" for stdout)
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alert):
+        line = json.dumps(alert) + "\n"
+        if self.path == "-":
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        else:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+class WebhookSink(object):
+    # POSTs the alert as JSON, e.g. to a Slack/ Teams/ Mattermost incoming webhook (which read "text")
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        body = json.dumps({"text": alert["text"], **alert}).encode("utf-8")
+        request = Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class UDPSink(object):
+    # One JSON datagram per alert, for a local listener or log shipper
+    def __init__(self, host, port):
+        self.address = (host, int(port))
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, alert):
+        self.socket.sendto(json.dumps(alert).encode("utf-8"), self.address)
+
+
+class DesktopSink(object):
+    # notify-send on Linux, osascript on macOS
+    def send(self, alert):
+        if sys.platform == "darwin":
+            script = f"display notification {json.dumps(alert['text'])} with title \"DGX Monitor\""
+            command = ["osascript", "-e", script]
+        else:
+            command = ["notify-send", "DGX Monitor", alert["text"]]
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_sink(spec):
+    # "desktop", "-", "file:/path/alerts.jsonl", "udp://host:port" or an http(s) webhook URL
+    if spec == "desktop":
+        return DesktopSink()
+    elif spec == "-":
+        return FileSink("-")
+    elif spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    elif spec.startswith("udp://"):
+        host, _, port = spec[len("udp://"):].rpartition(":")
+        return UDPSink(host, port)
+    elif spec.startswith(("http://", "https://")):
+        return WebhookSink(spec)
+    raise ValueError(f"Unknown alert sink: {spec}")
+
+
+class AlertEngine(object):
+    # Turns the statuses the core already computed into alerts, without any remote call of its own:
+    # - hysteresis: a job/ node must report the same level `hysteresis` refreshes in a row before it counts
+    # - deduplication: the same level of the same job/ node is only alerted once per `cooldown` seconds
+    # - rate limiting: at most `rate` alerts per minute over all sinks, the rest is summed up in one notice
+    # Sinks are called from a background thread, so a slow webhook never holds up the view
+    def __init__(self, sinks, levels=ALERT_LEVELS, hysteresis=2, cooldown=1800, rate=10):
+        self.sinks = sinks
+        self.levels = set(levels)
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.rate = rate
+        self.tokens = float(rate)
+        self.refilled = None
+        self.suppressed = 0
+        # (kind, name) -> confirmed level, candidate level and how many times in a row it was seen
+        self.confirmed = {}
+        self.candidates = {}
+        # (kind, name, level) -> when it was last alerted
+        self.sent = {}
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.deliver, daemon=True)
+        self.thread.start()
+
+    def observe(self, kind, name, level, message, value=None, now=None):
+        now = time.time() if now is None else now
+        key = (kind, name)
+        level = alert_level(level, message)
+        candidate, count = self.candidates.get(key, (None, 0))
+        count = count + 1 if candidate == level else 1
+        self.candidates[key] = (level, count)
+        previous = self.confirmed.get(key)
+        if count < self.hysteresis or level == previous:
+            return
+
+        self.confirmed[key] = level
+        if level in self.levels:
+            self.raise_alert(kind, name, level, message, value, "raised", now)
+        elif previous in self.levels:
+            self.raise_alert(kind, name, level, message, value, "resolved", now, previous)
+
+    def forget(self, kind, name):
+        # Job no longer monitored
+        self.confirmed.pop((kind, name), None)
+        self.candidates.pop((kind, name), None)
+
+    def raise_alert(self, kind, name, level, message, value, state, now, previous=None):
+        # Resolutions are deduplicated against the level they resolve from
+        dedup_key = (kind, name, level if state == "raised" else f"resolved {previous}")
+        if now - self.sent.get(dedup_key, float("-inf")) < self.cooldown:
+            return
+
+        if self.refilled is not None:
+            self.tokens = min(self.rate, self.tokens + (now - self.refilled) * self.rate / 60)
+        self.refilled = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            return
+        self.tokens -= 1
+        self.sent[dedup_key] = now
+
+        text = f"{kind} {name}: {message}" + (f" ({value:.2f})" if value is not None else "")
+        if state == "resolved":
+            text = f"Resolved: {text}"
+        if self.suppressed:
+            text += f" [{self.suppressed} more alerts suppressed by rate limiting]"
+        alert = {"time": now, "kind": kind, "name": name, "level": level, "state": state, "message": message,
+                 "value": value, "suppressed": self.suppressed, "text": text}
+        self.suppressed = 0
+        self.queue.put(alert)
+
+    def deliver(self):
+        while True:
+            alert = self.queue.get()
+            if alert is None:
+                return
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    print(f"Alert sink {type(sink).__name__} failed ({e!r})")
+
+    def close(self):
+        # Deliver whatever is queued, then stop
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+
+
+class PrefixedAlerts(object):
+    # View of a shared AlertEngine for one cluster: jobs and nodes are alerted as "<cluster>/<name>"
+    def __init__(self, alerts, prefix):
+        self.alerts = alerts
+        self.prefix = prefix
+
+    def observe(self, kind, name, *args, **kwargs):
+        self.alerts.observe(kind, f"{self.prefix}/{name}", *args, **kwargs)
+
+    def forget(self, kind, name):
+        self.alerts.forget(kind, f"{self.prefix}/{name}")
+
+    def close(self):
+        # The engine is shared, its owner closes it
+        pass
@@ -0,0 +1,181 @@
+# Measures the refresh data path (job list, job details, node aggregation and classification) against the simulated
+# cluster in fake_runai.py, with configurable job count, log volume, number of aggregating users and injected
+# round-trip latency. Each stage is first timed on its own, serially, then whole refreshes are timed end to end
+# through MonitorCore the way the views drive it (concurrent workers).
+#
+#   python3 benchmarks/bench_refresh.py --num_jobs 200 --delay_ms 50 --remote_aggregation --num_users 20
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import MonitorCore, MonitorListener  # noqa: E402
+from fake_runai import FakeCluster, FakeTransport  # noqa: E402
+from node_stats import NodeSummary  # noqa: E402
+
+
+class Stage(object):
+    # Wall time of every call, and peak Python allocations (tracemalloc) if enabled. Stages wrapping other stages
+    # do not track memory: the inner stages reset the peak
+    def __init__(self, name, track_memory=True):
+        self.name = name
+        self.times = []
+        self.peak = 0
+        self.track_memory = track_memory and tracemalloc.is_tracing()
+
+    def __enter__(self):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.times.append(time.perf_counter() - self.start)
+        if self.track_memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+
+    def report(self):
+        times = np.array(self.times) * 1000
+        memory = f"  peak {self.peak / (1024 * 1024):7.1f}MB" if self.track_memory else ""
+        return (f"{self.name:>20}: n={len(times):<5d} mean {times.mean():9.2f}ms  p50 {np.percentile(times, 50):9.2f}ms"
+                f"  max {times.max():9.2f}ms  total {times.sum():9.1f}ms{memory}")
+
+
+def write_peer_files(path, num_users, num_nodes, project, seed=0):
+    # Other users' aggregation files, as published by AggregationStore
+    rng = random.Random(seed)
+    for user in range(num_users):
+        nodes = {}
+        for node in range(num_nodes):
+            values = [rng.uniform(1, 4) for _ in range(rng.randint(1, 20))]
+            nodes[f"dgx{node + 1}-{project}"] = NodeSummary.from_values(values).to_dict()
+        with open(os.path.join(path, f"peer{user:04d}_node_summary.json"), "w") as f:
+            json.dump({"logging_mode": "s/it", "nodes": nodes}, f)
+
+
+def make_core(args, aggregation_path):
+    cluster = FakeCluster(num_jobs=args.num_jobs, num_nodes=args.num_nodes, pending_fraction=args.pending_fraction,
+                          job_age=args.job_age, line_interval=args.line_interval,
+                          log_line_bytes=args.log_line_bytes)
+    transport = FakeTransport(cluster, delay=args.delay_ms / 1000)
+    core = MonitorCore(username="bench", server_address="fake", job_names=None,
+                       loop_timing=int(args.interval * 1000),
+                       remote_aggregation=args.remote_aggregation,
+                       transport=transport,
+                       max_workers=args.max_workers,
+                       full_logs=args.full_logs,
+                       batch_collector=args.batch_collector,
+                       aggregation_path=aggregation_path)
+    return cluster, transport, core
+
+
+def run_stages(args, aggregation_path):
+    # Every stage called directly and serially, so that its cost is not hidden behind the worker pool
+    cluster, transport, core = make_core(args, aggregation_path)
+    stages = {name: Stage(name) for name in ["fetch_job_names", "get_job_details", "collect_batch",
+                                             "aggregate_nodes", "classify_nodes"]}
+    stages["refresh (serial)"] = Stage("refresh (serial)", track_memory=False)
+    for _ in range(args.refreshes):
+        with stages["refresh (serial)"]:
+            with stages["fetch_job_names"]:
+                job_names = core.fetch_job_names()
+            core.job_names = job_names
+
+            if args.batch_collector:
+                with stages["collect_batch"]:
+                    job_details = core.collect_batch(job_names)
+            else:
+                job_details = {}
+                for job_name in job_names:
+                    with stages["get_job_details"]:
+                        job_details[job_name] = core.get_job_details(job_name)
+
+            for job_name, (speed_mean, speed_latest, node, age) in job_details.items():
+                if not (speed_mean == -1 and speed_latest == -1):
+                    core.node_summaries.setdefault(node, NodeSummary()).add(speed_latest)
+            node_summaries = core.node_summaries
+            if args.remote_aggregation:
+                with stages["aggregate_nodes"]:
+                    node_summaries = core.aggregate_nodes(node_summaries)
+            with stages["classify_nodes"]:
+                core.on_nodes(node_summaries)
+        cluster.advance(args.interval)
+
+    core.close()
+    return [stage for stage in stages.values() if stage.times], transport
+
+
+class RefreshTimer(MonitorListener):
+    def __init__(self):
+        self.done = False
+
+    def on_refresh_done(self):
+        self.done = True
+
+
+def run_end_to_end(args, aggregation_path):
+    # Whole refreshes through MonitorCore, as the views run them
+    cluster, transport, core = make_core(args, aggregation_path)
+    core.listener = listener = RefreshTimer()
+    stage = Stage("refresh (concurrent)")
+    for _ in range(args.refreshes):
+        listener.done = False
+        with stage:
+            core.start_refresh()
+            while not listener.done:
+                core.process_results()
+                time.sleep(0.001)
+        cluster.advance(args.interval)
+    core.close()
+    return stage, transport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh benchmark on a simulated cluster")
+    parser.add_argument("--num_jobs", type=int, default=50)
+    parser.add_argument("--num_nodes", type=int, default=8)
+    parser.add_argument("--pending_fraction", type=float, default=0.1)
+    parser.add_argument("--job_age", type=float, default=3600, help="How long jobs have been logging, in s")
+    parser.add_argument("--line_interval", type=float, default=1.0, help="Seconds between two log lines of a job")
+    parser.add_argument("--log_line_bytes", type=int, default=120)
+    parser.add_argument("--delay_ms", type=float, default=0, help="Injected round-trip time of every remote call")
+    parser.add_argument("--interval", type=float, default=100,
+                        help="Simulated time between refreshes in s, i.e. how much each job logs in between")
+    parser.add_argument("--refreshes", type=int, default=5)
+    parser.add_argument("--max_workers", type=int, default=8)
+    parser.add_argument("--num_users", type=int, default=10, help="Other users in the aggregation directory")
+    parser.add_argument('--remote_aggregation', action='store_true')
+    parser.add_argument('--full_logs', action='store_true')
+    parser.add_argument('--batch_collector', action='store_true')
+    parser.add_argument('--trace_memory', action='store_true',
+                        help="Report peak Python allocations per stage (tracemalloc, slows everything down)")
+    args = parser.parse_args()
+
+    aggregation_path = tempfile.mkdtemp(prefix="bench_aggregation_")
+    try:
+        write_peer_files(aggregation_path, args.num_users, args.num_nodes, "amigo")
+        if args.trace_memory:
+            tracemalloc.start()
+        stages, transport = run_stages(args, aggregation_path)
+        end_to_end, end_to_end_transport = run_end_to_end(args, aggregation_path)
+    finally:
+        shutil.rmtree(aggregation_path, ignore_errors=True)
+
+    print(f"{args.num_jobs} jobs, {args.num_nodes} nodes, {args.refreshes} refreshes, "
+          f"{args.delay_ms:g}ms per remote call")
+    for stage in stages + [end_to_end]:
+        print(stage.report())
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+    print("Remote calls (serial stages):")
+    print(transport.latency_summary())
+    print("Remote calls (end to end):")
+    print(end_to_end_transport.latency_summary())
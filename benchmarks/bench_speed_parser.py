@@ -0,0 +1,105 @@
+# Compares the original speed parsing (read + decode the whole log, findall, convert every match, then slice) with
+# speed_parser.StreamingSpeedParser on a synthetic tqdm log. Each implementation runs in its own process so that
+# peak memory (max RSS) is measured separately.
+#
+#   python3 benchmarks/bench_speed_parser.py --size_mb 4096
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from speed_parser import StreamingSpeedParser  # noqa: E402
+
+
+def write_synthetic_log(path, size_mb, seed=0):
+    # tqdm-style progress output: carriage-return updates within an epoch, mixed s/it and it/s, some noise lines
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "wb") as f:
+        epoch = 0
+        while written < target:
+            lines = []
+            for step in range(1, 501):
+                speed = rng.uniform(0.5, 12.0)
+                unit = "s/it" if speed > 1 else "it/s"
+                lines.append(f"Epoch {epoch}: {step / 5:3.0f}%|###   | {step}/500 [01:23<04:56, {speed:.2f}{unit}, "
+                             f"loss=0.{rng.randint(0, 99999):05d}]\r")
+            lines.append(f"\nINFO epoch {epoch} finished, val_loss=0.{rng.randint(0, 99999):05d}\n")
+            block = "".join(lines).encode("latin-1")
+            f.write(block)
+            written += len(block)
+            epoch += 1
+
+
+def legacy_parse(path, logging_mode, speed_history):
+    # Same steps as the original get_job_details
+    with open(path, "rb") as f:
+        job_logs = f.read().decode("latin-1")
+    regex = re.compile("([0-9]*[.][0-9]*s/it|[0-9]*[.][0-9]*it/s)")
+    speed_matches = regex.findall(job_logs)
+    if logging_mode == "s/it":
+        speed_matches = [float(x.split("s/it")[0]) if "s/it" in x else 1 / float(x.split("it/s")[0])
+                         for x in speed_matches]
+    else:
+        speed_matches = [1 / float(x.split("s/it")[0]) if "s/it" in x else float(x.split("it/s")[0])
+                         for x in speed_matches]
+    return float(np.mean(speed_matches[-speed_history:])), speed_matches[-1]
+
+
+def streaming_parse(path, logging_mode, speed_history, chunk_size=1 << 20):
+    parser = StreamingSpeedParser(logging_mode, speed_history)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            parser.feed(chunk)
+    speeds = parser.close()
+    return speeds.mean(), speeds.latest()
+
+
+def run_one(name, path, logging_mode, speed_history, results):
+    start = time.perf_counter()
+    mean, latest = globals()[name](path, logging_mode, speed_history)
+    elapsed = time.perf_counter() - start
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((name, elapsed, max_rss_mb, mean, latest))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speed parser benchmark")
+    parser.add_argument("--size_mb", type=int, default=2048, help="Size of the synthetic log in MB")
+    parser.add_argument("--speed_history", type=int, default=100)
+    parser.add_argument("--logging_mode", type=str, default="s/it")
+    parser.add_argument("--log_path", type=str, help="Reuse an existing log instead of generating one")
+    parser.add_argument("--skip_legacy", action="store_true",
+                        help="Only run the streaming parser (the legacy one needs several times the log size in RAM)")
+    args = parser.parse_args()
+
+    log_path = args.log_path
+    if log_path is None:
+        log_path = os.path.join(tempfile.gettempdir(), f"bench_tqdm_{args.size_mb}mb.log")
+        if not os.path.exists(log_path) or os.path.getsize(log_path) < args.size_mb * 1024 * 1024:
+            print(f"Writing {args.size_mb}MB synthetic log to {log_path}")
+            write_synthetic_log(log_path, args.size_mb)
+    size_mb = os.path.getsize(log_path) / (1024 * 1024)
+
+    implementations = ["streaming_parse"] if args.skip_legacy else ["legacy_parse", "streaming_parse"]
+    results = multiprocessing.Queue()
+    for name in implementations:
+        process = multiprocessing.Process(target=run_one,
+                                          args=(name, log_path, args.logging_mode, args.speed_history, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{name}: failed with exit code {process.exitcode}")
+            continue
+        name, elapsed, max_rss_mb, mean, latest = results.get()
+        print(f"{name:>16}: {elapsed:8.2f}s  {size_mb / elapsed:8.1f}MB/s  max RSS {max_rss_mb:8.1f}MB  "
+              f"mean={mean:.4f} latest={latest:.4f}")
@@ -0,0 +1,75 @@
+import bisect
+import fnmatch
+
+# Status ladder, fastest first: a speed (in s/it) gets the first row whose bound, in multiples of the optimal upper
+# limit, it does not exceed. Every speed falls into exactly one row, boundaries included
+LEVELS = (
+    (1, "Excellent (for now)", "excellent"),
+    (2, "Normal", "normal"),
+    (10, "Worrying", "worrying"),
+    (float("inf"), "Extreme slowdown!", "extreme"),
+)
+
+
+class SpeedClassifier(object):
+    # Table-driven classification of job and node speeds. Speeds are normalised to s/it once, so the same bounds
+    # serve both logging modes. overrides maps glob patterns (job or node names) to their own optimal upper limit
+    def __init__(self, optimal_upper_limit=5, logging_mode="s/it", overrides=None):
+        self.logging_mode = logging_mode
+        self.bounds = self.make_bounds(optimal_upper_limit)
+        self.overrides = [(pattern, self.make_bounds(limit)) for pattern, limit in (overrides or {}).items()]
+        self.messages = [message for _, message, _ in LEVELS]
+        self.levels = [level for _, _, level in LEVELS]
+
+    def make_bounds(self, optimal_upper_limit):
+        # The optimal upper limit is in s/it whatever the logging mode (in it/s, its inverse is a lower limit)
+        return [factor * optimal_upper_limit for factor, _, _ in LEVELS[:-1]]
+
+    def bounds_for(self, name):
+        for pattern, bounds in self.overrides:
+            if name is not None and fnmatch.fnmatchcase(name, pattern):
+                return bounds
+        return self.bounds
+
+    def normalise(self, speed):
+        if self.logging_mode == "s/it":
+            return speed
+        return 1 / speed if speed else float("inf")
+
+    def classify(self, speed, name=None):
+        # One speed, returns (status message, level)
+        index = bisect.bisect_left(self.bounds_for(name), self.normalise(speed))
+        return self.messages[index], self.levels[index]
+
+    def classify_many(self, speeds, names=None):
+        # Array of speeds (and optionally the job/ node name of each) -> array of row indices into LEVELS,
+        # one searchsorted per distinct set of bounds
+        import numpy as np
+        speeds = np.asarray(speeds, dtype=np.float64)
+        if self.logging_mode != "s/it":
+            with np.errstate(divide="ignore"):
+                speeds = 1 / speeds
+        if not self.overrides or names is None:
+            return np.searchsorted(self.bounds, speeds, side="left")
+
+        indices = np.empty(len(speeds), dtype=np.intp)
+        groups = np.array([id(self.bounds_for(name)) for name in names])
+        for bounds in [self.bounds] + [bounds for _, bounds in self.overrides]:
+            mask = groups == id(bounds)
+            if mask.any():
+                indices[mask] = np.searchsorted(bounds, speeds[mask], side="left")
+        return indices
+
+    def level_names(self, indices):
+        return [self.levels[index] for index in indices]
+
+
+def parse_overrides(values):
+    # ["dgx5*=8", "ablation-*=2"] -> {"dgx5*": 8.0, "ablation-*": 2.0}
+    overrides = {}
+    for value in values or []:
+        pattern, _, limit = value.rpartition("=")
+        if not pattern:
+            raise ValueError(f"Expected PATTERN=LIMIT, got {value!r}")
+        overrides[pattern] = float(limit)
+    return overrides
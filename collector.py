@@ -0,0 +1,36 @@
+import json
+import os
+import shlex
+
+REMOTE_COLLECTOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remote_collector.py")
+
+
+class BatchedCollector(object):
+    # Sends remote_collector.py to the server and runs it there for all jobs at once: one remote call per refresh
+    # instead of a describe and a logs call per job. The payload comes back as JSON lines, one per job
+    def __init__(self, transport, max_workers=8):
+        self.transport = transport
+        self.max_workers = max_workers
+        with open(REMOTE_COLLECTOR_PATH, "rb") as f:
+            self.script = f.read()
+
+    def collect(self, log_commands, describe_jobs=None):
+        # log_commands maps each job name to the `runai logs ...` command to run for it. Only the jobs in
+        # describe_jobs (all of them if None) are described, the others come back with "describe": None
+        spec = {
+            "max_workers": self.max_workers,
+            "jobs": [{"name": job_name,
+                      "describe": (["runai", "describe", "job", job_name]
+                                   if describe_jobs is None or job_name in describe_jobs else None),
+                      "logs": shlex.split(log_command)}
+                     for job_name, log_command in log_commands.items()],
+        }
+        output = self.transport.run(f"python3 - {shlex.quote(json.dumps(spec))}", input=self.script,
+                                    label="collector")
+
+        payload = {}
+        for line in output.decode("utf-8").splitlines():
+            if line:
+                record = json.loads(line)
+                payload[record["job"]] = record
+        return payload
@@ -0,0 +1,519 @@
+import copy
+import re
+import time
+
+from aggregation import AggregationStore
+from classify import SpeedClassifier
+from collector import BatchedCollector
+from discovery import JobDiscovery, is_pattern
+from fetcher import JobFetcher
+from history import HistoryStore
+from log_tail import IncrementalLogReader
+from metadata import JobMetadata, MetadataCache, format_age, quiet_since_described
+from node_stats import MIN_WEIGHT, NodeSummary
+from scheduler import PollScheduler
+from state_cache import StateCache, apply_snapshot, build_snapshot, keyed_path
+from speed_parser import StreamingSpeedParser
+from transport import RemoteError, SSHTransport
+
+FAILED_DETAILS = (-1, -1, "Fetch failed", "N/A")
+# A running job is described again once its logs have been quiet for this many polls and loop_timing periods
+QUIET_POLLS = 3
+
+
+class MonitorListener(object):
+    # Views (Tk window, terminal, ...) subclass this and override whichever callbacks they need.
+    # Callbacks are only ever made from MonitorCore.process_results, i.e. on the thread driving the view
+    def on_job_list(self, job_names, added, removed):
+        pass
+
+    def on_job_details(self, job_name, job_details, status):
+        pass
+
+    def on_nodes(self, node_status):
+        pass
+
+    def on_refresh_done(self):
+        pass
+
+
+class MonitorCore(object):
+    # Polling and classification shared by every view, with no GUI dependency. A view calls start_refresh() on its
+    # own timer and process_results() regularly; results come back through the listener callbacks
+    def __init__(self, username, server_address, job_names,
+                 speed_history=100, loop_timing=10000, logging_mode="s/it", optimal_upper_limit=5,
+                 dynamic_job_list=True,
+                 remote_aggregation=False,
+                 transport=None,
+                 show_latency=False,
+                 max_workers=8,
+                 full_logs=False,
+                 batch_collector=False,
+                 aggregation_path="/nfs/project/AMIGO/Monitor_Aggregation",
+                 node_half_life=600,
+                 history_path=None,
+                 adaptive_polling=False,
+                 poll_budget=0,
+                 describe_interval=600,
+                 metrics_file=None,
+                 state_cache=None,
+                 started=None,
+                 limit_overrides=None,
+                 alerts=None):
+
+        # Assigning variables
+        self.username = username
+        self.server_address = server_address
+        self.job_names = job_names
+        self.speed_history = speed_history
+        self.loop_timing = loop_timing
+        self.logging_mode = logging_mode
+        self.optimal_upper_limit = optimal_upper_limit
+        self.current_time = time.time()
+        self.remote_aggregation = remote_aggregation
+        self.dynamic_job_list = dynamic_job_list
+        self.show_latency = show_latency
+        # One threshold table for jobs and nodes, optionally with other limits for some job/ node name patterns
+        self.classifier = SpeedClassifier(optimal_upper_limit, logging_mode, overrides=limit_overrides)
+        # All remote calls go through a single transport (by default a multiplexed ssh connection)
+        self.transport = transport if transport is not None else SSHTransport(username, server_address)
+        # Connecting (the ssh handshake) is the first thing the first refresh does on a worker, so that the cached
+        # state is painted without waiting for it
+        self.connected = False
+        # Remote calls and local stages (parsing, aggregation, classification, widgets) are all timed in here
+        self.metrics = self.transport.metrics
+        self.metrics_file = metrics_file
+        # Startup timings (first paint, first live data), measured from when the process started
+        self.started = time.time() if started is None else started
+        self.startup = {}
+        # Last known state on disk (one file per user@server), shown before the first refresh comes back
+        self.state_cache = (StateCache(keyed_path(state_cache, f"{username}@{server_address}"))
+                            if state_cache else None)
+        # Remote calls run on a bounded worker pool, results are picked up by process_results
+        self.fetcher = JobFetcher(max_workers=max_workers)
+        self.pending_jobs = set()
+        self.sweep_started = 0.0
+        # Optionally give every job its own polling interval around loop_timing, within a budget of remote calls
+        self.scheduler = PollScheduler(loop_timing / 1000, calls_per_minute=poll_budget) if adaptive_polling else None
+        self.last_job_list = 0.0
+        self.last_aggregation = 0.0
+        # Per-job log cursors, so each refresh only downloads and parses the new log lines
+        self.full_logs = full_logs
+        self.log_reader = IncrementalLogReader(self.transport, logging_mode=logging_mode, speed_history=speed_history)
+        # Crop factor, node and age from `runai describe job`, only described again when something changed
+        self.metadata = MetadataCache(max_age=describe_interval)
+        # Optionally gather every job's description and logs with a single remote call per refresh
+        self.collector = BatchedCollector(self.transport, max_workers=max_workers) if batch_collector else None
+        # Node speeds shared between users through the aggregation directory on the server
+        self.aggregation = AggregationStore(self.transport, aggregation_path, username, logging_mode,
+                                            half_life=node_half_life)
+        # Time-decayed summary of the speeds seen on each node, older samples count less
+        self.node_half_life = node_half_life
+        self.node_summaries = {}
+        # Optional on-disk speed history. Jobs saved by a previous run resume from their saved log cursor
+        self.history = HistoryStore(history_path) if history_path else None
+        if self.history is not None and not full_logs:
+            for job_name, (cursor, speeds) in self.history.job_states().items():
+                self.log_reader.restore(job_name, cursor, speeds)
+        # Optional AlertEngine, fed from the statuses computed below (no remote calls of its own)
+        self.alerts = alerts
+        # Preserve at all times the input job names
+        self.input_job_names = copy.deepcopy(self.job_names)
+
+        self.old_job_names = None
+        self.wildcard_presence = any(is_pattern(job_name) for job_name in self.input_job_names or [])
+        # Without job names or with patterns among them, jobs are discovered from the listing and filtered locally
+        self.discovery = JobDiscovery(self.transport, patterns=self.input_job_names)
+        self.first_pass = True
+
+        # Latest state, kept so that views can render it at any time
+        self.aggregate_summaries = {}
+        self.job_details = {}
+        self.job_status = {}
+        self.node_status = {}
+        self.last_update = 0.0
+        # Job name -> (status, time) of its last successful poll, served marked as stale while polls fail
+        self.fresh = {}
+
+        self.listener = MonitorListener()
+
+    def paint_cached(self):
+        # Fast start: report the state saved by the previous run to the listener before anything is polled
+        if self.state_cache is None:
+            return
+        state = self.state_cache.load()
+        # Only a state saved with the same logging mode and job names/ patterns
+        if (state is not None and state["logging_mode"] == self.logging_mode
+                and state.get("job_filter", []) == list(self.input_job_names or [])):
+            apply_snapshot(self, state)
+
+    def record_startup(self, label):
+        # Only the first time
+        if label not in self.startup:
+            self.startup[label] = time.time() - self.started
+            self.metrics.record(label, self.startup[label])
+            if self.show_latency:
+                print(f"{label}: {self.startup[label]:.2f}s after start")
+
+    def start_refresh(self):
+        # Start of a refresh: fetch the job list on a worker, the rest of the refresh is driven by process_results
+        if self.scheduler is not None:
+            # Refreshes come more often than loop_timing, only poll the jobs that are due. The job list itself is
+            # still only fetched every loop_timing
+            if not self.first_pass and time.time() - self.last_job_list < self.loop_timing / 1000:
+                self.on_job_list(self.job_names)
+                return
+            self.last_job_list = time.time()
+            self.scheduler.spend(1)
+        self.fetcher.submit(("job_list",), self.refresh_job_names)
+
+    def next_refresh_delay(self):
+        # Time in ms until views should call start_refresh again
+        if self.scheduler is not None:
+            # Until the next job is due (and the budget allows polling it), the job list is still due every loop_timing.
+            # Not sooner than the fastest polling interval, so jobs falling due close together share a sweep
+            now = time.time()
+            next_refresh = self.last_job_list + self.loop_timing / 1000
+            deadline = self.scheduler.next_deadline(cost=2 if self.collector is None else 1, now=now)
+            if deadline is not None:
+                next_refresh = min(next_refresh, deadline)
+            return int(max(self.scheduler.min_interval, next_refresh - now) * 1000)
+        return self.loop_timing
+
+    def process_results(self):
+        # Pick up whatever the workers have finished since the last call and notify the listener
+        sweep_timeout = max(self.loop_timing / 1000, self.transport.timeout)
+        if self.pending_jobs and time.time() - self.sweep_started > sweep_timeout:
+            # The sweep overran both a refresh period and the call timeout: cancel its stragglers and serve their last
+            # good result (marked stale) rather than letting one hung job or host hold back the whole refresh
+            print(f"Cancelling {len(self.pending_jobs)} overdue job polls")
+            self.transport.cancel()
+            for job_name in list(self.pending_jobs):
+                self.on_job_details(job_name, FAILED_DETAILS)
+        for key, result, error in self.fetcher.drain():
+            if error is not None:
+                print(f"{' '.join(key)}: fetch failed ({error!r})")
+            if key[0] == "job_list":
+                self.on_job_list(result if error is None else (self.job_names or []))
+            elif key[0] == "job":
+                self.on_job_details(key[1], result if error is None else FAILED_DETAILS)
+            elif key[0] == "batch":
+                for job_name in key[1:]:
+                    self.on_job_details(job_name, result[job_name] if error is None else FAILED_DETAILS)
+            elif key[0] == "nodes":
+                self.on_nodes(result if error is None else self.node_summaries)
+
+    def close(self):
+        self.fetcher.shutdown()
+        if self.history is not None:
+            self.history.close()
+        if self.alerts is not None:
+            self.alerts.close()
+
+    def refresh_job_names(self):
+        # Runs on a worker thread
+        if not self.connected:
+            self.transport.connect()
+            self.connected = True
+        if not self.first_pass and not self.dynamic_job_list:
+            return self.job_names
+
+        # Account for wildcards and missing job names
+        if not self.input_job_names or self.wildcard_presence:
+            return self.fetch_job_names()
+        return list(self.input_job_names)
+
+    def on_job_list(self, job_names):
+        changed = self.first_pass or job_names != self.job_names
+        if changed:
+            # Check if current job list is different from previous one
+            self.old_job_names = copy.deepcopy(self.job_names) or []
+            self.job_names = job_names
+            old_job_names, new_job_names = set(self.old_job_names), set(job_names)
+            added = [job_name for job_name in job_names if job_name not in old_job_names]
+            removed = [job_name for job_name in self.old_job_names if job_name not in new_job_names]
+            for job_name in removed:
+                self.metadata.invalidate(job_name)
+                self.job_details.pop(job_name, None)
+                self.job_status.pop(job_name, None)
+                self.fresh.pop(job_name, None)
+                if self.alerts is not None:
+                    self.alerts.forget("job", job_name)
+            self.listener.on_job_list(self.job_names, added, removed)
+
+        self.first_pass = False
+
+        job_names = self.job_names
+        if self.scheduler is not None:
+            # A batch is one remote call whatever the number of jobs in it, otherwise each job is describe + logs
+            self.scheduler.sync(self.job_names)
+            job_names = self.scheduler.due(cost=0 if self.collector is not None else 2)
+            if not job_names:
+                # Nothing due yet
+                self.listener.on_refresh_done()
+                return
+            if self.collector is not None:
+                self.scheduler.spend(1)
+
+        # Poll every job concurrently, each result is reported as soon as it arrives
+        self.pending_jobs = set(job_names)
+        self.sweep_started = time.time()
+        if self.collector is not None and job_names:
+            self.fetcher.submit(("batch", *job_names), self.collect_batch, list(job_names))
+        else:
+            for job_name in job_names:
+                self.fetcher.submit(("job", job_name), self.get_job_details, job_name)
+        if not self.pending_jobs:
+            self.on_sweep_done()
+
+    def on_job_details(self, job_name, job_details):
+        if job_name in self.job_names and job_details == FAILED_DETAILS and job_name in self.fresh:
+            # The poll failed (timeout, cancelled, unreadable output): keep the last good result, marked stale, and
+            # describe the job again next time in case that is what changed
+            self.metadata.invalidate(job_name)
+            (message, level), fresh_at = self.fresh[job_name]
+            status = (f"{message} (stale, {format_age(time.time() - fresh_at)} old)", level)
+            self.job_status[job_name] = status
+            if self.scheduler is not None:
+                self.scheduler.reschedule(job_name, "error")
+            self.listener.on_job_details(job_name, self.job_details[job_name], status)
+        elif job_name in self.job_names:
+            speed_mean, speed_latest, node, age = job_details
+            if speed_latest == -1 and speed_mean == -1:
+                # Specific error returned by investigating the job description
+                status = (node, "error")
+                self.fresh.pop(job_name, None)
+            else:
+                # Update node summary or add node key if not present
+                self.node_summaries.setdefault(node, NodeSummary(half_life=self.node_half_life)).add(speed_latest)
+                status = self.classify_speed(speed_latest, job_name)
+                self.fresh[job_name] = (status, time.time())
+                if self.history is not None:
+                    self.history.add("job", job_name, speed_latest)
+                    self.history.add("node", node, speed_latest)
+            self.job_details[job_name] = job_details
+            self.job_status[job_name] = status
+            if self.scheduler is not None:
+                self.scheduler.reschedule(job_name, status[1])
+            if self.alerts is not None:
+                self.alerts.observe("job", job_name, status[1], status[0],
+                                    None if status[1] == "error" else speed_latest)
+            self.listener.on_job_details(job_name, job_details, status)
+
+        # Results of polls given up on by a previous sweep are shown, but do not end the current one
+        if job_name in self.pending_jobs:
+            self.pending_jobs.discard(job_name)
+            if not self.pending_jobs:
+                self.on_sweep_done()
+
+    def on_sweep_done(self):
+        # Age every node summary, and forget nodes that have not had a running job for several half-lives
+        now = time.time()
+        self.node_summaries = {node: summary for node, summary in self.node_summaries.items()
+                               if summary.decay(now).count >= MIN_WEIGHT}
+        self.save_history()
+
+        if self.remote_aggregation and (self.scheduler is None
+                                        or now - self.last_aggregation >= self.loop_timing / 1000):
+            self.last_aggregation = now
+            if self.scheduler is not None:
+                self.scheduler.spend(1)
+            # Aggregation also talks to the server: hand it to a worker with a snapshot of this sweep's nodes
+            node_summaries = {node: summary.copy() for node, summary in self.node_summaries.items()}
+            self.fetcher.submit(("nodes",), self.aggregate_nodes, node_summaries)
+        elif self.remote_aggregation:
+            # Sweeps in between (adaptive polling) do not exchange with the server: merge this sweep's nodes with the
+            # other users' summaries from the last exchange, locally. No exchange is in flight here, the refresh
+            # only ends once it is back
+            with self.metrics.time("merge nodes"):
+                node_summaries = self.aggregation.merge(self.node_summaries)
+            self.on_nodes(node_summaries)
+        else:
+            self.on_nodes(self.node_summaries)
+
+    def on_nodes(self, node_summaries):
+        # Loop through either our node summaries or the ones aggregated over all users: O(nodes)
+        self.aggregate_summaries = node_summaries
+        previous_status, self.node_status = self.node_status, {}
+        with self.metrics.time("classify nodes"):
+            nodes = [node for node, summary in node_summaries.items() if node != "Job not found" and summary.count > 0]
+            means = [node_summaries[node].mean for node in nodes]
+            for node, mean, index in zip(nodes, means, self.classifier.classify_many(means, nodes)):
+                self.node_status[node] = (mean, self.classifier.messages[index], self.classifier.levels[index])
+        if self.alerts is not None:
+            for node, (mean, message, level) in self.node_status.items():
+                self.alerts.observe("node", node, level, message, mean)
+            for node in previous_status.keys() - self.node_status.keys():
+                self.alerts.forget("node", node)
+
+        self.last_update = time.time() - self.current_time
+        self.listener.on_nodes(self.node_status)
+        self.record_startup("first live data")
+        if self.state_cache is not None:
+            self.state_cache.save(build_snapshot(self))
+
+        # Update time
+        self.current_time = time.time()
+
+        if self.show_latency:
+            print(self.metrics.summary())
+        if self.metrics_file:
+            self.metrics.write(self.metrics_file)
+
+        self.listener.on_refresh_done()
+
+    def save_history(self):
+        # Every job of the sweep has reported, so no worker is touching the log reader: one transaction per refresh
+        if self.history is None:
+            return
+        for job_name in self.job_names or []:
+            state = self.log_reader.state(job_name)
+            if state is not None:
+                self.history.save_job_state(job_name, *state)
+        with self.metrics.time("history"):
+            self.history.flush()
+
+    def classify_speed(self, speed, name=None):
+        # Returns (status message, level); views map the level to their own colours
+        return self.classifier.classify(speed, name)
+
+    def fetch_job_names(self):
+        # Running jobs matching the job name patterns (inference jobs excluded), from the discovery deltas
+        job_names, added, removed, changed = self.discovery.poll()
+        # A job that changed status or node must be described again, a deleted one is forgotten
+        for job_name in changed:
+            self.metadata.invalidate(job_name)
+        for job_name in removed:
+            self.metadata.forget(job_name)
+        return job_names
+
+    def collect_batch(self, job_names):
+        # Runs on a worker thread: one remote round-trip for all jobs, then every job is parsed locally
+        log_commands = {job_name: f"runai logs {job_name}" if self.full_logs else self.log_reader.log_command(job_name)
+                        for job_name in job_names}
+        describe_jobs = [job_name for job_name in job_names if self.metadata.get(job_name) is None]
+        payload = self.collector.collect(log_commands, describe_jobs)
+
+        job_details = {}
+        for job_name in job_names:
+            try:
+                record = payload[job_name]
+                # describe() looks for runai's "could not find any job", which only goes to stderr
+                job_description = record["describe"]
+                if job_description is not None:
+                    job_description += record.get("describe_stderr", "")
+                job_details[job_name] = self.get_job_details(job_name, job_description,
+                                                             record["logs"].encode("latin-1"))
+            except Exception as e:
+                print(f"{job_name}: fetch failed ({e!r})")
+                job_details[job_name] = FAILED_DETAILS
+        return job_details
+
+    def get_job_details(self, job_name, job_description=None, job_logs=None):
+        # Get job description, unless it is cached or the batched collector already fetched it
+        metadata = self.metadata.get(job_name) if job_description is None else None
+        if metadata is None:
+            if job_description is None:
+                try:
+                    job_description = self.transport.run(f"runai describe job {job_name}").decode("latin-1")
+                except RemoteError as e:
+                    # runai reports a missing job on stderr, with a non-zero exit code
+                    if "could not find any job" not in e.stderr:
+                        raise
+                    job_description = e.stderr
+            with self.metrics.time("parse describe"):
+                metadata = self.describe(job_name, job_description)
+            if not isinstance(metadata, JobMetadata):
+                return metadata
+
+        # Get latest iteration speeds: either only the log lines written since the last poll, or the full logs
+        if self.full_logs:
+            # Parsing is interleaved with the download here: only time the parser itself
+            parser = StreamingSpeedParser(self.logging_mode, self.speed_history)
+            elapsed = 0.0
+            size = 0
+            for chunk in (self.transport.stream(f"runai logs {job_name}") if job_logs is None else [job_logs]):
+                start = time.perf_counter()
+                parser.feed(chunk)
+                elapsed += time.perf_counter() - start
+                size += len(chunk)
+            start = time.perf_counter()
+            speeds = parser.close()
+            self.metrics.record("parse logs", elapsed + time.perf_counter() - start, bytes_in=size)
+        else:
+            if job_logs is None:
+                job_logs = self.transport.run(self.log_reader.log_command(job_name))
+            start = time.perf_counter()
+            speeds = self.log_reader.ingest(job_name, job_logs)
+            self.metrics.record("parse logs", time.perf_counter() - start, bytes_in=len(job_logs))
+
+        # Nothing logged for a while: the job may have stopped, describe it again next time. Only once per quiet
+        # stretch, and not on every quiet poll, since slow jobs can log less often than they are polled
+        if quiet_since_described(metadata, self.log_reader.quiet.get(job_name), QUIET_POLLS,
+                                 QUIET_POLLS * self.loop_timing / 1000):
+            self.metadata.invalidate(job_name)
+
+        # Account for the fact that the job might have just started and not have any speed matches yet
+        if len(speeds) == 0:
+            return -1, -1, "Job just started: No speed matches yet", "N/A"
+
+        speed_mean = speeds.mean()
+        speed_latest = speeds.latest()
+
+        # Multiple samples taken per iteration: Need to account for this in the logging mode
+        if metadata.crop_samples:
+            if self.logging_mode == "s/it":
+                speed_latest /= metadata.crop_samples
+                speed_mean /= metadata.crop_samples
+            else:
+                speed_latest *= metadata.crop_samples
+                speed_mean *= metadata.crop_samples
+        return speed_mean, speed_latest, metadata.node, metadata.current_age()
+
+    def describe(self, job_name, job_description):
+        # Returns the job's JobMetadata, or the error details if it is not running
+        if "could not find any job" in job_description:
+            self.log_reader.reset(job_name)
+            self.metadata.invalidate(job_name)
+            return -1, -1, "Job not found", "N/A"
+        # Determine if pending or failed
+        elif "ERROR" in job_description:
+            self.log_reader.reset(job_name)
+            self.metadata.invalidate(job_name)
+            return -1, -1, "Job failed", "N/A"
+        elif "PENDING" in job_description:
+            self.log_reader.reset(job_name)
+            self.metadata.invalidate(job_name)
+            return -1, -1, "Job pending", "N/A"
+
+        # Determine if multiple samples are taken per iteration
+        crop_regex = re.compile(r"num_crop_samples [0-9]+")
+        crop_matches = crop_regex.findall(job_description)
+        num_crop_samples = int(re.findall(r"\d+", crop_matches[0])[0]) if crop_matches else None
+
+        # Isolate job node
+        node_match = re.search(r'dgx[\w-]+(?=/)', job_description)
+
+        # Get job age
+        job_description_lines = job_description.split("\n")
+
+        # Find line that contains job age: the one after the POD header
+        pod_fields = next((job_description_lines[i + 1].split() for i, line in enumerate(job_description_lines[:-1])
+                           if line.startswith("POD")), [])
+        if node_match is None or len(pod_fields) < 2:
+            # Truncated or unexpected output: a failed poll (served stale), not a reason to stop the refresh
+            raise ValueError(f"Unreadable `runai describe job {job_name}` output")
+        job_node = node_match.group(0)
+        job_pod = pod_fields[0]
+        job_age = pod_fields[-2]
+
+        metadata = JobMetadata(job_pod, job_node, num_crop_samples, job_age)
+        previous = self.metadata.put(job_name, metadata)
+        if previous is not None and previous.pod != job_pod:
+            # New pod, new logs: the cursor belongs to the old one
+            self.log_reader.reset(job_name)
+        return metadata
+
+    def aggregate_nodes(self, node_summaries):
+        # Publish our node summaries and merge in every other user's, in a single remote call
+        return self.aggregation.exchange(node_summaries)
@@ -0,0 +1,155 @@
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.request import urlopen
+
+from core import MonitorListener
+from fetcher import JobFetcher
+from metrics import Metrics
+from state_cache import apply_snapshot, build_snapshot
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    # http.server only has this from Python 3.7
+    daemon_threads = True
+
+
+class MonitorDaemon(MonitorListener):
+    # Runs the polling loop once and serves the cached state over local HTTP, so any number of thin clients
+    # (DaemonClient below) can display it without talking to the server themselves
+    def __init__(self, core, host="127.0.0.1", port=8765):
+        self.core = core
+        self.core.listener = self
+        self.drain_interval = 0.1
+        self.next_refresh = 0.0
+        self.lock = threading.Lock()
+        # Serve the last known state (if cached) until the first refresh comes back
+        self.core.paint_cached()
+        self.snapshot = build_snapshot(core)
+
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/state":
+                    with daemon.lock:
+                        body = json.dumps(daemon.snapshot).encode()
+                    self.reply(200, body, "application/json")
+                elif self.path == "/metrics":
+                    self.reply(200, daemon.core.metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+                elif self.path == "/metrics.json":
+                    self.reply(200, json.dumps(daemon.core.metrics.to_json()).encode(), "application/json")
+                elif self.path == "/healthz":
+                    self.reply(200, b"ok\n", "text/plain")
+                else:
+                    self.reply(404, b"not found\n", "text/plain")
+
+            def reply(self, code, body, content_type):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def run(self):
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        server_thread.start()
+        print(f"Serving monitor state on http://{self.server.server_address[0]}:{self.server.server_address[1]}/state")
+        try:
+            while True:
+                if self.next_refresh is not None and time.time() >= self.next_refresh:
+                    self.next_refresh = None
+                    self.core.start_refresh()
+                self.core.process_results()
+                time.sleep(self.drain_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.shutdown()
+            self.core.close()
+
+    def publish(self):
+        snapshot = build_snapshot(self.core)
+        with self.lock:
+            self.snapshot = snapshot
+
+    def on_job_list(self, job_names, added, removed):
+        self.publish()
+
+    def on_job_details(self, job_name, job_details, status):
+        self.publish()
+
+    def on_nodes(self, node_status):
+        self.publish()
+
+    def on_refresh_done(self):
+        # Schedule the next update
+        self.next_refresh = time.time() + self.core.next_refresh_delay() / 1000
+
+
+class DaemonClient(object):
+    # Thin reader of a MonitorDaemon. Exposes the same attributes and calls as MonitorCore as far as the views are
+    # concerned, so the Tk window and the terminal view work unchanged on top of it
+    def __init__(self, url, username=None, loop_timing=10000, timeout=10, started=None):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.loop_timing = loop_timing
+        self.timeout = timeout
+        self.fetcher = JobFetcher(max_workers=1)
+        self.listener = MonitorListener()
+        self.metrics = Metrics()
+        self.started = time.time() if started is None else started
+        self.startup = {}
+
+        self.job_names = []
+        self.job_details = {}
+        self.job_status = {}
+        self.node_status = {}
+        self.last_update = 0.0
+        self.logging_mode = "s/it"
+        self.remote_aggregation = False
+
+    def start_refresh(self):
+        self.fetcher.submit(("state",), self.fetch_state)
+
+    def next_refresh_delay(self):
+        return self.loop_timing
+
+    def fetch_state(self):
+        start = time.perf_counter()
+        with urlopen(f"{self.url}/state", timeout=self.timeout) as response:
+            body = response.read()
+        self.metrics.record("daemon state", time.perf_counter() - start, bytes_in=len(body), kind="remote")
+        return json.loads(body.decode("utf-8"))
+
+    def process_results(self):
+        for key, result, error in self.fetcher.drain():
+            if error is not None:
+                print(f"{self.url}: fetch failed ({error!r})")
+            else:
+                self.apply(result)
+            self.listener.on_refresh_done()
+
+    def apply(self, state):
+        self.logging_mode = state["logging_mode"]
+        apply_snapshot(self, state)
+        self.record_startup("first live data")
+
+    def paint_cached(self):
+        # Nothing cached here, the daemon answers straight away
+        pass
+
+    def record_startup(self, label):
+        if label not in self.startup:
+            self.startup[label] = time.time() - self.started
+            self.metrics.record(label, self.startup[label])
+
+    def close(self):
+        self.fetcher.shutdown()
@@ -0,0 +1,61 @@
+import fnmatch
+import re
+
+
+def is_pattern(job_name):
+    # Glob (job-*, run-?-a) or regular expression (re:^run-[0-9]+$)
+    return job_name.startswith("re:") or any(char in job_name for char in "*?[")
+
+
+def compile_filter(patterns):
+    # Globs (and plain names) must match the whole job name like in a shell, regular expressions match anywhere in
+    # it like grep. No patterns matches every job
+    matchers = [re.compile(pattern[3:]).search if pattern.startswith("re:")
+                else re.compile(fnmatch.translate(pattern)).match
+                for pattern in patterns or []]
+    if not matchers:
+        return lambda job_name: True
+    return lambda job_name: any(matcher(job_name) for matcher in matchers)
+
+
+class JobDiscovery(object):
+    # Keeps the set of known jobs (status and node per job) and turns each listing into add/ remove/ change deltas.
+    # The listing is a single `runai list` whose lines are filtered locally, so any number of glob or regex
+    # patterns are supported and state changes (Running -> Pending, rescheduled on another node) are seen too
+    def __init__(self, transport, patterns=None, exclude=("inf-",)):
+        self.transport = transport
+        self.matches = compile_filter(patterns)
+        self.exclude = exclude
+        # Job name -> (status, node), in the order jobs were first seen so that views keep a stable order
+        self.jobs = {}
+
+    def parse(self, listing):
+        # NAME STATUS AGE NODE ...: only the lines after the header (if any) are jobs
+        lines = listing.split("\n")
+        header = next((i for i, line in enumerate(lines) if line.split()[:1] == ["NAME"]), -1)
+        jobs = {}
+        for line in lines[header + 1:]:
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            job_name = fields[0]
+            if any(excluded in job_name for excluded in self.exclude) or not self.matches(job_name):
+                continue
+            jobs[job_name] = (fields[1], fields[3] if len(fields) > 3 else None)
+        return jobs
+
+    def poll(self):
+        # Returns (running job names, added, removed, changed), where changed maps a job to its new (status, node)
+        jobs = self.parse(self.transport.run("runai list", label="runai list").decode("latin-1"))
+        added = [job_name for job_name in jobs if job_name not in self.jobs]
+        removed = [job_name for job_name in self.jobs if job_name not in jobs]
+        changed = {job_name: state for job_name, state in jobs.items()
+                   if job_name in self.jobs and self.jobs[job_name] != state}
+
+        for job_name in removed:
+            del self.jobs[job_name]
+        self.jobs.update(changed)
+        for job_name in added:
+            self.jobs[job_name] = jobs[job_name]
+        running = [job_name for job_name, (status, _) in self.jobs.items() if status == "Running"]
+        return running, added, removed, changed
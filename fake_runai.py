@@ -0,0 +1,173 @@
+import json
+import math
+import random
+import shlex
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from transport import Transport
+
+DESCRIBE_TEMPLATE = """Name: {name}
+Namespace: runai-{project}
+Type: Train
+Status: {status}
+Duration: {age}
+Command: python3 train.py{crop}
+
+Pods:
+POD           STATUS   TYPE   AGE    NODE
+{name}-0-0    {status}  TRAIN  {age}  {node}/10.0.{index}.1
+"""
+LIST_HEADER = ("NAME  STATUS  AGE  NODE  IMAGE  TYPE  PROJECT  USER  GPUs Allocated (Requested)  "
+               "PODs Running (Pending)  SERVICE URL(S)")
+
+
+def format_age(seconds):
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes = seconds // 60
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{minutes}m"
+    return f"{minutes}m"
+
+
+def format_timestamp(seconds):
+    # RFC3339Nano as printed by `runai logs --timestamps`
+    whole = int(seconds)
+    nanos = int(round((seconds - whole) * 1e9))
+    stamp = datetime.fromtimestamp(whole, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    return f"{stamp}.{nanos:09d}".rstrip("0").rstrip(".") + "Z"
+
+
+def parse_timestamp(timestamp):
+    base, _, fraction = timestamp.rstrip("Z").partition(".")
+    seconds = datetime.strptime(base, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    return seconds + (float(f"0.{fraction}") if fraction else 0.0)
+
+
+class FakeJob(object):
+    def __init__(self, name, index, node, status, started, speed, crop_samples, line_interval, log_line_bytes,
+                 unit):
+        self.name = name
+        self.index = index
+        self.node = node
+        self.status = status
+        self.started = started
+        self.speed = speed
+        self.crop_samples = crop_samples
+        self.line_interval = line_interval
+        self.unit = unit
+        # Pad each progress line so that log volume can be scaled independently of the number of lines
+        self.padding = "#" * max(0, log_line_bytes - 100)
+
+    def line(self, k):
+        # Deterministic per line, so that repeated/ overlapping fetches see the same output
+        speed = self.speed * (1 + 0.1 * math.sin(k))
+        value = speed if self.unit == "s/it" else 1 / speed
+        timestamp = format_timestamp(self.started + k * self.line_interval)
+        return (f"{timestamp} Epoch {k // 500}: {(k % 500) / 5:3.0f}%|{self.padding}| {k % 500}/500 "
+                f"[01:23<04:56, {value:.2f}{self.unit}, loss=0.{k % 99991:05d}]")
+
+    def lines(self, now, since=None, tail=None, timestamps=True):
+        last = int((now - self.started) / self.line_interval)
+        first = 0
+        if since is not None:
+            first = max(first, math.ceil((since - self.started) / self.line_interval))
+        if tail is not None:
+            first = max(first, last - tail + 1)
+        for k in range(first, last + 1):
+            line = self.line(k)
+            yield line if timestamps else line.partition(" ")[2]
+
+
+class FakeCluster(object):
+    # Simulated RunAI cluster: a fixed set of jobs whose logs grow with wall-clock time
+    def __init__(self, num_jobs=10, num_nodes=4, pending_fraction=0.1, slow_fraction=0.2, job_age=3600,
+                 line_interval=1.0, log_line_bytes=120, unit="s/it", project="amigo", seed=0):
+        rng = random.Random(seed)
+        now = time.time()
+        self.project = project
+        # Simulated time runs ahead of the wall clock by this many seconds, see advance()
+        self.offset = 0.0
+        self.jobs = {}
+        for index in range(num_jobs):
+            name = f"fake-job-{index:04d}"
+            status = "Pending" if rng.random() < pending_fraction else "Running"
+            speed = rng.uniform(15, 60) if rng.random() < slow_fraction else rng.uniform(1, 4)
+            self.jobs[name] = FakeJob(name=name, index=index, node=f"dgx{index % num_nodes + 1}-{project}",
+                                      status=status, started=now - job_age * rng.uniform(0.5, 1.0), speed=speed,
+                                      crop_samples=rng.choice([None, None, 2, 4]), line_interval=line_interval,
+                                      log_line_bytes=log_line_bytes, unit=unit)
+
+    def advance(self, seconds):
+        # Let simulated time (and so the logs) move on without waiting for it
+        self.offset += seconds
+
+    def runai(self, args, now=None):
+        now = time.time() + self.offset if now is None else now
+        if args[:1] == ["list"]:
+            lines = [LIST_HEADER]
+            for job in self.jobs.values():
+                lines.append(f"{job.name}  {job.status}  {format_age(now - job.started)}  {job.node}  image:latest  "
+                             f"Train  {self.project}  user  1 (1)  {1 if job.status == 'Running' else 0} (0)")
+            return "\n".join(lines) + "\n"
+
+        if args[:2] == ["describe", "job"]:
+            job = self.jobs.get(args[2])
+            if job is None:
+                return f"could not find any job named {args[2]}\n"
+            crop = f" --num_crop_samples {job.crop_samples}" if job.crop_samples else ""
+            return DESCRIBE_TEMPLATE.format(name=job.name, project=self.project, index=job.index, node=job.node,
+                                            status=job.status.upper(), age=format_age(now - job.started), crop=crop)
+
+        if args[:1] == ["logs"]:
+            job = self.jobs.get(args[1])
+            if job is None or job.status != "Running":
+                return ""
+            since = tail = None
+            if "--since-time" in args:
+                since = parse_timestamp(args[args.index("--since-time") + 1])
+            if "--tail" in args:
+                tail = int(args[args.index("--tail") + 1])
+            lines = job.lines(now, since=since, tail=tail, timestamps="--timestamps" in args)
+            return "".join(line + "\n" for line in lines)
+
+        return ""
+
+
+class FakeTransport(Transport):
+    # Serves `runai` commands from a FakeCluster instead of a real server, so the whole pipeline can be run and
+    # measured locally. Anything after a pipe (e.g. `| grep Running`) and every non-runai command runs in a local shell
+    def __init__(self, cluster=None, delay=0.0, **options):
+        super().__init__(**options)
+        self.cluster = cluster if cluster is not None else FakeCluster()
+        # Simulated round-trip time added to every call
+        self.delay = delay
+
+    def _execute(self, command, input=None, timeout=None):
+        if self.delay:
+            time.sleep(self.delay if timeout is None else min(self.delay, timeout))
+            if timeout is not None and self.delay > timeout:
+                raise subprocess.TimeoutExpired(command, timeout)
+
+        if command.startswith("runai "):
+            runai_command, _, pipeline = command.partition("|")
+            output = self.cluster.runai(shlex.split(runai_command)[1:]).encode("latin-1")
+            if pipeline:
+                return self.communicate(pipeline, output, timeout, shell=True)
+            return 0, output, b""
+
+        if command.startswith("python3 - "):
+            spec = json.loads(shlex.split(command)[2])
+            if "jobs" in spec:
+                # remote_collector.py: answer it directly from the simulated cluster
+                lines = [json.dumps({"job": job["name"],
+                                     "describe": self.cluster.runai(job["describe"][1:]) if job["describe"] else None,
+                                     "logs": self.cluster.runai(job["logs"][1:])})
+                         for job in spec["jobs"]]
+                return 0, "".join(line + "\n" for line in lines).encode("utf-8"), b""
+
+        return self.communicate(command, input, timeout, shell=True)
@@ -0,0 +1,56 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobFetcher(object):
+    # Runs blocking fetches on a bounded pool of worker threads and hands the results back through a queue,
+    # so the Tk loop only ever drains finished results and never waits on a remote call itself
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.results = queue.Queue()
+        self.in_flight = set()
+        # Submitted and not finished yet, so that shutdown can cancel the queued ones
+        self.futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        with self._lock:
+            if key in self.in_flight:
+                # Still waiting on this key from a previous tick: its result will arrive, do not pile up calls
+                return False
+            self.in_flight.add(key)
+        future = self.executor.submit(self._run, key, fn, *args)
+        with self._lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+        return True
+
+    def _done(self, future):
+        with self._lock:
+            self.futures.discard(future)
+
+    def _run(self, key, fn, *args):
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        with self._lock:
+            self.in_flight.discard(key)
+        self.results.put((key, result, error))
+
+    def drain(self):
+        items = []
+        while True:
+            try:
+                items.append(self.results.get_nowait())
+            except queue.Empty:
+                return items
+
+    def shutdown(self):
+        # Queued calls are dropped (executor.shutdown(cancel_futures=True) needs Python 3.9)
+        with self._lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+        self.executor.shutdown(wait=False)
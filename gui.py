@@ -0,0 +1,300 @@
+import time
+import tkinter as tk
+from tkinter import ttk, font
+
+from core import MonitorListener
+
+# Label style and font for each status level reported by MonitorCore.classify_speed
+STATUS_STYLES = {
+    "extreme": ("FR.TLabel", ("gothic", 18, "bold")),
+    "worrying": ("FO.TLabel", ("gothic", 16, "bold")),
+    "normal": ("FG.TLabel", ("gothic", 15, "bold")),
+    "excellent": ("FB.TLabel", ("gothic", 15, "bold")),
+    "error": ("FP.TLabel", ("gothic", 16, "bold")),
+}
+
+
+class JobView(object):
+    # Persistent widgets for one job: labels are only reconfigured when what they display actually changes
+    def __init__(self, parent, job_name):
+        self.frame = ttk.Frame(parent)
+        self.frame.pack()
+
+        self.job_name_label = ttk.Label(self.frame, text=f"Job name: {job_name}", font=("gothic", 16, "bold"))
+        self.job_name_label.pack()
+
+        self.speed_mean_label = ttk.Label(self.frame, text="Speed mean: ", font=("gothic", 15, "normal"))
+        self.speed_mean_label.pack()
+
+        self.speed_latest_label = ttk.Label(self.frame, text="Speed latest: ", font=("gothic", 15, "normal"))
+        self.speed_latest_label.pack()
+
+        self.status_label = ttk.Label(self.frame, text="Status: ")
+        self.status_label.pack()
+
+        self.speeds_visible = True
+        self.options = {}
+
+    def set(self, label, **options):
+        if self.options.get(label) != options:
+            label.config(**options)
+            self.options[label] = options
+
+    def show_speeds(self, visible):
+        # Speed labels are hidden while the job is pending/ failed/ not found, instead of being destroyed
+        if visible == self.speeds_visible:
+            return
+        if visible:
+            self.speed_mean_label.pack(before=self.status_label)
+            self.speed_latest_label.pack(before=self.status_label)
+        else:
+            self.speed_mean_label.pack_forget()
+            self.speed_latest_label.pack_forget()
+        self.speeds_visible = visible
+
+    def destroy(self):
+        self.frame.destroy()
+
+
+class NodeView(object):
+    # Persistent node section: one label per node, keyed by node name and updated in place
+    def __init__(self, parent):
+        self.frame = ttk.Frame(parent)
+        self.frame.pack()
+
+        self.last_update_label = ttk.Label(self.frame, font=("gothic", 16, "bold"))
+        self.last_update_label.pack()
+        self.title_label = ttk.Label(self.frame, font=("gothic", 20, "bold"))
+        self.title_label.pack()
+        # Add a space
+        self.spacer_label = ttk.Label(self.frame, text="\n\n")
+        self.spacer_label.pack()
+
+        self.node_labels = {}
+        self.options = {}
+
+    def set(self, label, **options):
+        if self.options.get(label) != options:
+            label.config(**options)
+            self.options[label] = options
+
+    def set_node(self, node, **options):
+        if node not in self.node_labels:
+            self.node_labels[node] = ttk.Label(self.frame)
+            self.node_labels[node].pack(before=self.spacer_label)
+        self.set(self.node_labels[node], **options)
+
+    def retain_nodes(self, nodes):
+        # Remove nodes that no longer have any jobs
+        for node in set(self.node_labels) - set(nodes):
+            label = self.node_labels.pop(node)
+            self.options.pop(label, None)
+            label.destroy()
+
+
+class DiagnosticsView(object):
+    # Collapsible per-stage timings (remote calls, parsing, aggregation, widgets), folded by default
+    def __init__(self, parent):
+        self.frame = ttk.Frame(parent)
+        self.frame.pack()
+        self.expanded = False
+        self.toggle_button = ttk.Button(self.frame, text="Diagnostics \u25b8", command=self.toggle)
+        self.toggle_button.pack()
+        self.text_label = ttk.Label(self.frame, font=("courier", 10, "normal"), justify=tk.LEFT)
+        self.text = ""
+
+    def toggle(self):
+        self.expanded = not self.expanded
+        if self.expanded:
+            self.text_label.config(text=self.text)
+            self.text_label.pack()
+        else:
+            self.text_label.pack_forget()
+        self.toggle_button.config(text="Diagnostics \u25be" if self.expanded else "Diagnostics \u25b8")
+
+    def set(self, text):
+        if text != self.text:
+            self.text = text
+            if self.expanded:
+                self.text_label.config(text=text)
+
+
+class SpeedGUI(MonitorListener):
+    def __init__(self, core, festive=False):
+        self.core = core
+        self.core.listener = self
+        self.festive = festive
+        self.drain_interval = 100
+
+        self.root = tk.Tk()
+        self.root.title("Marshall Monitor" if core.username == "pedro" else "DGX Monitor")
+        self.root.attributes("-topmost", True)
+
+        # Initialising empty variables to be assigned later by the on_job_list method
+        self.gif_label = None
+        self.frames = None
+        self.ind = None
+        self.image = None
+        self.max_job_width = None
+        self.geometry = None
+
+        # Set up styles
+        self.style = ttk.Style()
+        self.style.configure("BW.TLabel", background="white")
+        self.style.configure("FB.TLabel", foreground="black")
+        self.style.configure("FR.TLabel", foreground="red")
+        self.style.configure("FO.TLabel", foreground="dark orange")
+        self.style.configure("FG.TLabel", foreground="green")
+        self.style.configure("FB.TLabel", foreground="blue")
+        self.style.configure("FP.TLabel", foreground="purple")
+
+        # Scrollbar test
+        # Create a main frame that contains everything
+        main_frame = ttk.Frame(self.root)
+        main_frame.pack(fill=tk.BOTH, expand=1)
+
+        # Create a canvas and attach it to the main frame
+        self.canvas = tk.Canvas(main_frame)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=1)
+
+        # Add a scrollbar to the canvas
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Configure the canvas to work with the scrollbar
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.bind('<Configure>',
+                         lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+
+        # Create another frame inside the canvas to hold job-related frames
+        self.scrollable_job_frame = ttk.Frame(self.canvas)
+        self.canvas.create_window((0, 0),
+                                  window=self.scrollable_job_frame, anchor="nw")
+
+        # Node section on top, then one retained view per job, keyed by job name
+        self.node_view = NodeView(self.scrollable_job_frame)
+        self.diagnostics_view = DiagnosticsView(self.scrollable_job_frame)
+        self.job_views = {}
+        self.current_times = {}
+
+        # Show the last known state (if cached) right away, live data replaces it as it comes in
+        self.core.paint_cached()
+        self.root.after_idle(self.core.record_startup, "first paint")
+
+        self.root.after(0, self.update_all)
+        self.root.after(self.drain_interval, self.drain_results)
+
+        self.root.mainloop()
+        self.core.close()
+
+    def update_all(self):
+        self.core.start_refresh()
+
+    def drain_results(self):
+        # Results are applied to the widgets from the Tk loop, never from the worker threads
+        self.core.process_results()
+        self.root.after(self.drain_interval, self.drain_results)
+
+    def on_job_list(self, job_names, added, removed):
+        with self.core.metrics.time("widgets"):
+            self.update_job_list(job_names, added, removed)
+
+    def update_job_list(self, job_names, added, removed):
+        # Only add/ remove the jobs that changed, every other job keeps its widgets
+        for job_name in removed:
+            self.job_views.pop(job_name).destroy()
+            self.current_times.pop(job_name, None)
+        for job_name in added:
+            self.job_views[job_name] = JobView(self.scrollable_job_frame, job_name)
+            # Starting time
+            self.current_times[job_name] = time.time()
+
+        # Find the longest job name
+        label_font = font.Font(family="gothic", size=16, weight="bold")
+        self.max_job_width = max([label_font.measure(job_name) for job_name in job_names], default=0)
+
+        # Festive
+        if self.festive and self.gif_label is None:
+            from urllib.request import urlopen
+            from PIL import Image
+            from PIL import ImageTk as itk
+            from io import BytesIO
+            URL = "https://i.gifer.com/origin/35/353fb026a4147fc679d3292fdd59663f_w200.gif"
+
+            gif_data = urlopen(URL).read()
+            self.image = Image.open(BytesIO(gif_data))
+            self.ind = 0
+            self.frames = [itk.PhotoImage(self.image.copy()) for _ in range(self.image.n_frames)]
+
+            self.gif_label = ttk.Label(image=self.frames[self.ind])
+            self.gif_label.pack()
+            self.canvas.after(0, self.update_gifs)
+
+    def update_gifs(self):
+        from PIL import Image
+        from PIL import ImageTk as itk
+        # https://stackoverflow.com/questions/28518072/play-animations-in-gif-with-tkinter
+        self.ind += 1
+        if self.ind == len(self.frames):
+            self.ind = 0
+
+        # Reload the image for each frame
+        self.image.seek(self.ind)
+        self.frames[self.ind] = itk.PhotoImage(self.image.resize((200, 200), Image.LANCZOS).copy())
+
+        self.gif_label.configure(image=self.frames[self.ind])
+        self.canvas.after(120, self.update_gifs)
+
+    def on_job_details(self, job_name, job_details, status):
+        with self.core.metrics.time("widgets"):
+            self.update_job(job_name, job_details, status)
+
+    def update_job(self, job_name, job_details, status):
+        view = self.job_views[job_name]
+        speed_mean, speed_latest, node, age = job_details
+        message, level = status
+        style, status_font = STATUS_STYLES[level]
+
+        if level == "error":
+            # Only the job name and job status labels are shown while pending/ failed/ non-existent
+            view.show_speeds(False)
+            # Update job with specific error returned by investigating the job description
+            view.set(view.status_label, text=f"{message}\n\n", style=style, font=status_font)
+        else:
+            view.show_speeds(True)
+            view.set(view.job_name_label, text=f"{job_name} ({age})")
+            view.set(view.speed_mean_label, text=f"Speed mean: {speed_mean:.2f}{self.core.logging_mode}",
+                     style="BB.TLabel")
+            view.set(view.speed_latest_label, text=f"Speed latest: {speed_latest:.2f}{self.core.logging_mode}")
+            # Update status box
+            view.set(view.status_label, text=f"{node} Status: {message}\n\n", style=style, font=status_font)
+
+        self.current_times[job_name] = time.time()
+
+    def on_nodes(self, node_status):
+        with self.core.metrics.time("widgets"):
+            self.update_nodes(node_status)
+
+    def update_nodes(self, node_status):
+        # Update node label
+        last_update_text = f"Last update: {self.core.last_update:.1f}s\n"
+        self.node_view.set(self.node_view.last_update_label, text=last_update_text)
+        node_text = f"Node info{' (Remote aggregation)' if self.core.remote_aggregation else ''}"
+        self.node_view.set(self.node_view.title_label, text=node_text)
+
+        self.node_view.retain_nodes(node_status)
+        for node, (mean_node_speed, node_message, level) in node_status.items():
+            node_style, node_font = STATUS_STYLES[level]
+            self.node_view.set_node(node, text=f"{node}: {node_message}", font=node_font, style=node_style)
+
+    def on_refresh_done(self):
+        # Schedule the next update
+        self.canvas.after(self.core.next_refresh_delay(), self.update_all)
+
+        # Set geometry, only when the longest job name changed
+        geometry = f"{self.max_job_width + 80}x1000"
+        if geometry != self.geometry:
+            self.root.geometry(geometry)
+            self.geometry = geometry
+
+        self.diagnostics_view.set(self.core.metrics.summary())
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Rollup bucket sizes in s. Queries over long ranges read the coarsest buckets that still give enough points, so
+# a range of weeks costs a few hundred rows whatever the polling rate
+ROLLUPS = (60, 600, 3600)
+# Raw samples are only kept this long (s), the rollups are kept forever
+RAW_RETENTION = 7 * 24 * 3600
+# Saved log cursors older than this (s) are not restored: catching up with --since-time would fetch more than a tail
+RESTORE_MAX_AGE = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (kind TEXT, name TEXT, t REAL, speed REAL);
+CREATE INDEX IF NOT EXISTS samples_series ON samples (kind, name, t);
+CREATE TABLE IF NOT EXISTS rollups (kind TEXT, name TEXT, resolution INTEGER, bucket INTEGER,
+                                    n INTEGER, total REAL, min REAL, max REAL,
+                                    PRIMARY KEY (kind, name, resolution, bucket)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS job_state (job TEXT PRIMARY KEY, cursor TEXT, speeds BLOB, t REAL);
+"""
+
+
+class HistoryStore(object):
+    # On-disk history of per-job and per-node speeds (SQLite). Samples are buffered in memory and written in one
+    # transaction per refresh, together with 1m/10m/1h rollups and each job's log cursor and speed buffer so that a
+    # restarted monitor can carry on from where it stopped
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.pending = []
+        self.pending_state = {}
+        self.last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, kind, name, speed, t=None):
+        # kind is "job" or "node"
+        self.pending.append((kind, name, time.time() if t is None else t, float(speed)))
+
+    def save_job_state(self, job_name, cursor, speeds):
+        import numpy as np
+        self.pending_state[job_name] = (cursor, np.asarray(speeds, dtype=np.float64).tobytes(), time.time())
+
+    def flush(self):
+        with self._lock:
+            samples, self.pending = self.pending, []
+            state, self.pending_state = self.pending_state, {}
+            if not samples and not state:
+                return
+            with self.connection:
+                self.connection.executemany("INSERT INTO samples VALUES (?, ?, ?, ?)", samples)
+                for resolution in ROLLUPS:
+                    self.connection.executemany(
+                        "INSERT INTO rollups VALUES (?, ?, ?, ?, 1, ?, ?, ?) "
+                        "ON CONFLICT (kind, name, resolution, bucket) DO UPDATE SET "
+                        "n = n + 1, total = total + excluded.total, "
+                        "min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+                        [(kind, name, resolution, int(t // resolution), speed, speed, speed)
+                         for kind, name, t, speed in samples])
+                self.connection.executemany("INSERT OR REPLACE INTO job_state VALUES (?, ?, ?, ?)",
+                                            [(job_name, *values) for job_name, values in state.items()])
+            self.prune()
+
+    def prune(self):
+        # At most once an hour
+        now = time.time()
+        if now - self.last_prune < 3600:
+            return
+        self.last_prune = now
+        with self.connection:
+            self.connection.execute("DELETE FROM samples WHERE t < ?", (now - RAW_RETENTION,))
+            self.connection.execute("DELETE FROM job_state WHERE t < ?", (now - RAW_RETENTION,))
+
+    def query(self, kind, name, start=None, end=None, resolution=None, max_points=500):
+        # Returns [(t, mean, min, max, n)] oldest first. resolution=0 reads the raw samples, None picks the finest
+        # rollup giving at most max_points buckets over the range
+        end = time.time() if end is None else end
+        start = end - RAW_RETENTION if start is None else start
+        if resolution is None:
+            resolution = next((r for r in ROLLUPS if (end - start) / r <= max_points), ROLLUPS[-1])
+        with self._lock:
+            if resolution == 0:
+                rows = self.connection.execute(
+                    "SELECT t, speed, speed, speed, 1 FROM samples WHERE kind = ? AND name = ? AND t BETWEEN ? AND ? "
+                    "ORDER BY t", (kind, name, start, end)).fetchall()
+            else:
+                rows = self.connection.execute(
+                    "SELECT bucket * ?, total / n, min, max, n FROM rollups "
+                    "WHERE kind = ? AND name = ? AND resolution = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                    (resolution, kind, name, resolution, int(start // resolution), int(end // resolution))).fetchall()
+        return rows
+
+    def names(self, kind):
+        with self._lock:
+            return [name for name, in self.connection.execute(
+                "SELECT DISTINCT name FROM rollups WHERE kind = ? AND resolution = ?", (kind, ROLLUPS[-1]))]
+
+    def job_states(self, max_age=RESTORE_MAX_AGE):
+        # {job: (cursor, speeds oldest to newest)} for jobs saved recently enough to be resumed
+        import numpy as np
+        with self._lock:
+            rows = self.connection.execute("SELECT job, cursor, speeds FROM job_state WHERE t >= ?",
+                                           (time.time() - max_age,)).fetchall()
+        return {job_name: (cursor, np.frombuffer(speeds, dtype=np.float64)) for job_name, cursor, speeds in rows}
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    # Print the history of a job or node, e.g. to see when a node started to degrade
+    import argparse
+    from datetime import datetime
+
+    from classify import SpeedClassifier
+
+    parser = argparse.ArgumentParser(description="Query the speed history written with --history_path")
+    parser.add_argument("--history_path", type=str, help="History database", required=True)
+    parser.add_argument("--kind", type=str, choices=["job", "node"], default="node")
+    parser.add_argument("--name", type=str, help="Job or node name, all of them if not given")
+    parser.add_argument("--hours", type=float, help="How far back to look", default=24)
+    parser.add_argument("--resolution", type=int, choices=[0, *ROLLUPS],
+                        help="Bucket size in s (0 for raw samples), picked from the range if not given")
+    parser.add_argument("--optimal_upper_limit", type=float, help="Optimal upper limit for speed in s/it", default=5)
+    parser.add_argument("--logging_mode", type=str, help="Logging mode the history was written in", default="s/it")
+    args = parser.parse_args()
+    # Only reads: do not leave an empty database behind for a mistyped path
+    if not os.path.exists(args.history_path):
+        parser.error(f"No history at {args.history_path}")
+
+    store = HistoryStore(args.history_path)
+    classifier = SpeedClassifier(args.optimal_upper_limit, args.logging_mode)
+    start = time.time() - args.hours * 3600
+    for name in [args.name] if args.name else sorted(store.names(args.kind)):
+        print(name)
+        rows = store.query(args.kind, name, start=start, resolution=args.resolution)
+        # Status of every bucket in one call
+        levels = classifier.level_names(classifier.classify_many([mean for _, mean, _, _, _ in rows]))
+        for (t, mean, low, high, n), level in zip(rows, levels):
+            print(f"  {datetime.fromtimestamp(t):%Y-%m-%d %H:%M}  mean {mean:.2f}  min {low:.2f}  max {high:.2f}  n {n}"
+                  f"  {level}")
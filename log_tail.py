@@ -0,0 +1,86 @@
+import re
+import time
+
+from speed_parser import StreamingSpeedParser
+
+# --timestamps prefixes every line with an RFC3339Nano UTC timestamp. Anything else (e.g. "Error from server ...") is
+# not a log line and must not become the cursor
+TIMESTAMP_REGEX = re.compile(rb"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$")
+
+
+def timestamp_key(timestamp):
+    # Kubernetes RFC3339Nano timestamps drop trailing zeros from the fraction, so pad before comparing
+    base, _, fraction = timestamp.rstrip("Z").partition(".")
+    return f"{base}.{fraction.ljust(9, '0')}"
+
+
+class IncrementalLogReader(object):
+    # Keeps a per-job cursor (timestamp of the last log line seen) so each poll only fetches the output
+    # written since the previous one, and a streaming parser holding the last speed_history speeds per job
+    def __init__(self, transport, logging_mode="s/it", speed_history=100, initial_tail=None):
+        self.transport = transport
+        self.logging_mode = logging_mode
+        self.speed_history = speed_history
+        # On the first poll of a job only its most recent lines are needed to fill the speed buffer
+        self.initial_tail = initial_tail if initial_tail is not None else max(1000, 10 * speed_history)
+        self.cursors = {}
+        self.parsers = {}
+        # Jobs whose last poll returned no new lines -> (time of the first of these polls, how many in a row)
+        self.quiet = {}
+
+    def log_command(self, job_name):
+        cursor = self.cursors.get(job_name)
+        if cursor is None:
+            return f"runai logs {job_name} --timestamps --tail {self.initial_tail}"
+        return f"runai logs {job_name} --timestamps --since-time {cursor}"
+
+    def ingest(self, job_name, job_logs):
+        # job_logs: raw bytes of `runai logs --timestamps` output
+        cursor = self.cursors.get(job_name)
+        cursor_key = timestamp_key(cursor) if cursor is not None else None
+        parser = self.parsers.get(job_name)
+        if parser is None:
+            parser = self.parsers[job_name] = StreamingSpeedParser(self.logging_mode, self.speed_history)
+
+        new_lines = []
+        for line in job_logs.split(b"\n"):
+            timestamp, _, text = line.partition(b" ")
+            if not TIMESTAMP_REGEX.match(timestamp):
+                continue
+            timestamp = timestamp.decode("latin-1")
+            # --since-time is inclusive: skip anything that was already parsed on the previous poll
+            if cursor_key is not None and timestamp_key(timestamp) <= cursor_key:
+                continue
+            new_lines.append(text)
+            cursor, cursor_key = timestamp, timestamp_key(timestamp)
+
+        if new_lines:
+            self.quiet.pop(job_name, None)
+        else:
+            since, polls = self.quiet.get(job_name, (time.time(), 0))
+            self.quiet[job_name] = (since, polls + 1)
+        if cursor is not None:
+            self.cursors[job_name] = cursor
+        parser.feed(b"\n".join(new_lines))
+        return parser.close()
+
+    def state(self, job_name):
+        # (cursor, speeds oldest to newest), or None if the job has not been read yet
+        cursor = self.cursors.get(job_name)
+        parser = self.parsers.get(job_name)
+        if cursor is None or parser is None:
+            return None
+        return cursor, parser.speeds.ordered()
+
+    def restore(self, job_name, cursor, speeds):
+        # Resume a job saved by a previous run: the next poll only fetches what was logged since then
+        parser = self.parsers[job_name] = StreamingSpeedParser(self.logging_mode, self.speed_history)
+        if len(speeds):
+            parser.speeds.extend(speeds)
+        self.cursors[job_name] = cursor
+
+    def reset(self, job_name):
+        # Job stopped running (pending/ failed/ resubmitted): start from a fresh tail next time
+        self.cursors.pop(job_name, None)
+        self.parsers.pop(job_name, None)
+        self.quiet.pop(job_name, None)
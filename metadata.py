@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+
+AGE_REGEX = re.compile(r"(\d+)([dhms])")
+AGE_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+def parse_age(age):
+    # "2d3h", "1h12m", "37m", "45s" -> seconds, None for anything else
+    parts = AGE_REGEX.findall(age)
+    if not parts or "".join(value + unit for value, unit in parts) != age:
+        return None
+    return sum(int(value) * AGE_UNITS[unit] for value, unit in parts)
+
+
+def format_age(seconds):
+    # Same (two most significant units) format as runai
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{minutes}m"
+    if minutes:
+        return f"{minutes}m"
+    return f"{seconds}s"
+
+
+class JobMetadata(object):
+    # What `runai describe job` tells us about a running job that does not change while its pod lives
+    def __init__(self, pod, node, crop_samples, age, fetched=None):
+        self.pod = pod
+        self.node = node
+        self.crop_samples = crop_samples
+        self.age = age
+        self.age_seconds = parse_age(age)
+        self.fetched = time.time() if fetched is None else fetched
+        # Set when something suggests the job changed: it is described again, but the old pod is still known
+        self.expired = False
+
+    def current_age(self, now=None):
+        # Extrapolated from the age at describe time, so the age stays current between describes
+        if self.age_seconds is None:
+            return self.age
+        now = time.time() if now is None else now
+        return format_age(self.age_seconds + now - self.fetched)
+
+
+def quiet_since_described(metadata, quiet, polls, seconds, now=None):
+    # quiet: (since, polls) from IncrementalLogReader.quiet, or None. True once the job's logs have been quiet for at
+    # least `polls` polls and `seconds`, and that whole stretch started after the job was last described
+    if quiet is None:
+        return False
+    now = time.time() if now is None else now
+    since, quiet_polls = quiet
+    return quiet_polls >= polls and now - since >= seconds and metadata.fetched < since
+
+
+class MetadataCache(object):
+    # Per-job JobMetadata, so `runai describe job` only runs when a job starts, when its status or pod changes, and
+    # otherwise every max_age seconds. Accessed from the worker threads
+    def __init__(self, max_age=600):
+        self.max_age = max_age
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_name, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            metadata = self.entries.get(job_name)
+            if metadata is None or metadata.expired or now - metadata.fetched > self.max_age:
+                return None
+            return metadata
+
+    def put(self, job_name, metadata):
+        # Returns the metadata it replaces, if any
+        with self._lock:
+            previous = self.entries.get(job_name)
+            self.entries[job_name] = metadata
+            return previous
+
+    def invalidate(self, job_name):
+        # Describe the job again on its next poll. The entry is kept, so that put() can still tell a new pod
+        with self._lock:
+            metadata = self.entries.get(job_name)
+            if metadata is not None:
+                metadata.expired = True
+
+    def forget(self, job_name):
+        # Job deleted
+        with self._lock:
+            self.entries.pop(job_name, None)
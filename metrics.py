@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (s) of the duration histogram buckets, the last bucket is +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class StageStats(object):
+    # Counters and duration histogram of one instrumented stage: a remote command ("runai logs", "collector", ...) or
+    # a local one ("parse logs", "classify", "widgets", ...)
+    def __init__(self, kind="local"):
+        self.kind = kind
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.last = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(self, elapsed, ok=True, bytes_in=0, bytes_out=0):
+        self.count += 1
+        self.total += elapsed
+        self.last = elapsed
+        self.min = min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        if not ok:
+            self.errors += 1
+        self.buckets[next((i for i, bound in enumerate(BUCKETS) if elapsed <= bound), len(BUCKETS))] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th quantile
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.buckets):
+            cumulative += count
+            if count and cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"kind": self.kind, "count": self.count, "errors": self.errors, "total": self.total,
+                "mean": self.mean, "min": self.min if self.count else 0.0, "max": self.max, "last": self.last,
+                "p95": self.quantile(0.95), "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], self.buckets))}
+
+
+class Metrics(object):
+    # Thread-safe registry of StageStats, shared by the transport (remote calls) and the core and views (local
+    # stages). Exported as a text summary, JSON or the Prometheus text format
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, elapsed, ok=True, bytes_in=0, bytes_out=0, kind="local"):
+        with self._lock:
+            stats = self.stages.get(label)
+            if stats is None:
+                stats = self.stages[label] = StageStats(kind)
+            stats.record(elapsed, ok, bytes_in, bytes_out)
+
+    @contextmanager
+    def time(self, label, kind="local"):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(label, time.perf_counter() - start, ok=False, kind=kind)
+            raise
+        self.record(label, time.perf_counter() - start, kind=kind)
+
+    def summary(self, kind=None):
+        with self._lock:
+            stages = sorted((label, stats) for label, stats in self.stages.items() if kind in (None, stats.kind))
+            lines = [f"{label}: n={stats.count} errors={stats.errors} mean={stats.mean:.3f}s "
+                     f"p95={stats.quantile(0.95):.3f}s max={stats.max:.3f}s last={stats.last:.3f}s"
+                     + (f" in={stats.bytes_in / 1024:.1f}kB out={stats.bytes_out / 1024:.1f}kB"
+                        if stats.bytes_in or stats.bytes_out else "")
+                     for label, stats in stages]
+        return "\n".join(lines)
+
+    def to_json(self):
+        with self._lock:
+            return {label: stats.to_dict() for label, stats in self.stages.items()}
+
+    def to_prometheus(self, prefix="runai_monitor"):
+        # The exposition format wants each metric family in one block after its TYPE line, so one loop per family
+        with self._lock:
+            stages = [(f'stage="{label}",kind="{stats.kind}"', stats) for label, stats in sorted(self.stages.items())]
+            lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+            for labels, stats in stages:
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in BUCKETS] + ["+Inf"], stats.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{prefix}_stage_seconds_sum{{{labels}}} {stats.total}")
+                lines.append(f"{prefix}_stage_seconds_count{{{labels}}} {stats.count}")
+            lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+            for labels, stats in stages:
+                lines.append(f"{prefix}_stage_errors_total{{{labels}}} {stats.errors}")
+            lines.append(f"# TYPE {prefix}_stage_bytes_total counter")
+            for labels, stats in stages:
+                lines.append(f'{prefix}_stage_bytes_total{{{labels},direction="in"}} {stats.bytes_in}')
+                lines.append(f'{prefix}_stage_bytes_total{{{labels},direction="out"}} {stats.bytes_out}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Prometheus text for *.prom (e.g. for node_exporter's textfile collector), JSON otherwise. Written atomically
+        text = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_json(), indent=1)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+
+class PrefixedMetrics(object):
+    # Records into a shared Metrics under "<prefix>/<label>", e.g. one prefix per cluster
+    def __init__(self, metrics, prefix):
+        self.metrics = metrics
+        self.prefix = prefix
+
+    def record(self, label, *args, **kwargs):
+        self.metrics.record(f"{self.prefix}/{label}", *args, **kwargs)
+
+    def time(self, label, kind="local"):
+        return self.metrics.time(f"{self.prefix}/{label}", kind)
+
+    def summary(self, kind=None):
+        return "\n".join(line for line in self.metrics.summary(kind).split("\n")
+                         if line.startswith(f"{self.prefix}/"))
+
+    def to_json(self):
+        return {label: stats for label, stats in self.metrics.to_json().items() if label.startswith(f"{self.prefix}/")}
+
+    def to_prometheus(self, prefix="runai_monitor"):
+        return self.metrics.to_prometheus(prefix)
+
+    def write(self, path):
+        self.metrics.write(path)
@@ -0,0 +1,188 @@
+import time
+
+from alerts import PrefixedAlerts
+from core import MonitorCore, MonitorListener
+from metrics import Metrics, PrefixedMetrics
+from state_cache import keyed_path
+from transport import make_transport
+
+
+def parse_cluster(cluster, username):
+    # "user@host" or "host": the cluster is named as given, so one host can be monitored as several users
+    user, _, server_address = cluster.rpartition("@")
+    return cluster, user or username, server_address
+
+
+class ClusterListener(MonitorListener):
+    # Forwards one cluster's callbacks to the MultiClusterCore, which prefixes job and node names with the cluster
+    def __init__(self, multi, name):
+        self.multi = multi
+        self.name = name
+
+    def on_job_list(self, job_names, added, removed):
+        self.multi.on_cluster_job_list(self.name, job_names, added, removed)
+
+    def on_job_details(self, job_name, job_details, status):
+        self.multi.on_cluster_job_details(self.name, job_name, job_details, status)
+
+    def on_nodes(self, node_status):
+        self.multi.on_cluster_nodes(self.name, node_status)
+
+    def on_refresh_done(self):
+        self.multi.on_cluster_refresh_done(self.name)
+
+
+class MultiClusterCore(object):
+    # One MonitorCore per cluster (own transport, worker pool and schedule), presented to the views as a single
+    # core: jobs and nodes are shown as "<cluster>/<name>" and the node table is merged across clusters. Each cluster
+    # refreshes on its own, so a slow or unreachable one never holds back the others
+    def __init__(self, clusters, username, job_names=None, transport="ssh", state_cache=None, history_path=None,
+                 metrics_file=None, started=None, alerts=None, call_timeout=60, retries=2, **options):
+        self.username = username
+        self.started = time.time() if started is None else started
+        self.startup = {}
+        self.metrics_file = metrics_file
+        # Shared registry, every cluster records under its own prefix
+        self.metrics = Metrics()
+        # One alert engine for every cluster, so deduplication and rate limiting span all of them
+        self.alerts = alerts
+
+        def make_core(cluster):
+            name, cluster_username, server_address = parse_cluster(cluster, username)
+            core = MonitorCore(username=cluster_username, server_address=server_address, job_names=job_names,
+                               transport=make_transport(transport, cluster_username, server_address,
+                                                        timeout=call_timeout, retries=retries),
+                               state_cache=state_cache,
+                               history_path=keyed_path(history_path, name),
+                               started=self.started, **options)
+            core.metrics = core.transport.metrics = PrefixedMetrics(self.metrics, name)
+            if alerts is not None:
+                core.alerts = PrefixedAlerts(alerts, name)
+            return name, core
+
+        # Cores do not connect when built: each cluster connects on its own workers with its first refresh, so an
+        # unreachable cluster neither delays startup nor takes the others down
+        self.cores = {}
+        for cluster in clusters:
+            try:
+                if parse_cluster(cluster, username)[0] in self.cores:
+                    raise ValueError("given twice")
+                name, core = make_core(cluster)
+            except Exception as e:
+                print(f"{cluster}: not monitored ({e!r})")
+                continue
+            self.cores[name] = core
+        if not self.cores:
+            raise RuntimeError(f"None of the clusters {clusters} could be set up")
+        self.busy = set()
+        # The view waits for one on_refresh_done per start_refresh: clusters finishing while start_refresh runs, or
+        # after it was already sent, must not send more (each would start another refresh timer in the view)
+        self.refresh_pending = False
+        self.starting = False
+        self.done_while_starting = False
+        self.next_refresh = {}
+        for name, core in self.cores.items():
+            core.listener = ClusterListener(self, name)
+            self.next_refresh[name] = 0.0
+
+        first = next(iter(self.cores.values()))
+        self.logging_mode = first.logging_mode
+        self.remote_aggregation = first.remote_aggregation
+
+        self.job_names = []
+        self.job_details = {}
+        self.job_status = {}
+        self.node_status = {}
+        self.aggregate_summaries = {}
+        self.last_update = 0.0
+        self.listener = MonitorListener()
+
+    def start_refresh(self):
+        # Start every idle cluster whose next refresh is due
+        now = time.time()
+        self.refresh_pending = True
+        self.starting = True
+        self.done_while_starting = False
+        try:
+            for name, core in self.cores.items():
+                if name not in self.busy and now >= self.next_refresh[name]:
+                    self.busy.add(name)
+                    core.start_refresh()
+        finally:
+            self.starting = False
+        if not self.busy or self.done_while_starting:
+            # Nothing due yet, or a cluster had nothing to poll: let the view schedule the next call
+            self.refresh_done()
+
+    def refresh_done(self):
+        if self.starting:
+            self.done_while_starting = True
+        elif self.refresh_pending:
+            self.refresh_pending = False
+            self.listener.on_refresh_done()
+
+    def next_refresh_delay(self):
+        # Until the next idle cluster is due
+        now = time.time()
+        due = [self.next_refresh[name] for name in self.cores if name not in self.busy]
+        return max(0, int((min(due) - now) * 1000)) if due else min(core.next_refresh_delay()
+                                                                      for core in self.cores.values())
+
+    def process_results(self):
+        for core in self.cores.values():
+            core.process_results()
+
+    def paint_cached(self):
+        for core in self.cores.values():
+            core.paint_cached()
+
+    def record_startup(self, label):
+        if label not in self.startup:
+            self.startup[label] = time.time() - self.started
+            self.metrics.record(label, self.startup[label])
+
+    def close(self):
+        for core in self.cores.values():
+            core.close()
+        if self.alerts is not None:
+            self.alerts.close()
+
+    def on_cluster_job_list(self, name, job_names, added, removed):
+        added = [f"{name}/{job_name}" for job_name in added]
+        removed = [f"{name}/{job_name}" for job_name in removed]
+        for job_name in removed:
+            self.job_details.pop(job_name, None)
+            self.job_status.pop(job_name, None)
+        # Clusters stay grouped, in the order they were given
+        self.job_names = [f"{cluster}/{job_name}" for cluster, core in self.cores.items()
+                          for job_name in core.job_names or []]
+        self.listener.on_job_list(self.job_names, added, removed)
+
+    def on_cluster_job_details(self, name, job_name, job_details, status):
+        speed_mean, speed_latest, node, age = job_details
+        job_name = f"{name}/{job_name}"
+        if speed_mean == -1 and speed_latest == -1:
+            job_details = (speed_mean, speed_latest, node, age)
+        else:
+            job_details = (speed_mean, speed_latest, f"{name}/{node}", age)
+        self.job_details[job_name] = job_details
+        self.job_status[job_name] = status
+        self.listener.on_job_details(job_name, job_details, status)
+
+    def on_cluster_nodes(self, name, node_status):
+        core = self.cores[name]
+        self.node_status = {node: value for node, value in self.node_status.items()
+                            if not node.startswith(f"{name}/")}
+        self.node_status.update({f"{name}/{node}": value for node, value in node_status.items()})
+        self.aggregate_summaries = {f"{cluster}/{node}": summary for cluster, other in self.cores.items()
+                                    for node, summary in other.aggregate_summaries.items()}
+        self.last_update = core.last_update
+        self.listener.on_nodes(self.node_status)
+
+    def on_cluster_refresh_done(self, name):
+        self.busy.discard(name)
+        self.next_refresh[name] = time.time() + self.cores[name].next_refresh_delay() / 1000
+        self.record_startup("first live data")
+        if self.metrics_file:
+            self.metrics.write(self.metrics_file)
+        self.refresh_done()
@@ -0,0 +1,187 @@
+import math
+import time
+
+# Below this decayed weight a node has not had a running job for several half-lives: it drops out of the node table
+MIN_WEIGHT = 0.05
+
+
+class QuantileSketch(object):
+    # Log-bucketed histogram (DDSketch-style): every value lands in bucket ceil(log(x) / log(gamma)), so quantiles are
+    # accurate to within `relative_accuracy`, merging is adding bucket weights and decaying is scaling them
+    def __init__(self, relative_accuracy=0.05, max_buckets=64):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets = {}
+
+    def add(self, value, weight=1.0):
+        if not value > 0 or math.isinf(value):
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0.0) + weight
+        self.collapse()
+
+    def add_many(self, values):
+        import numpy as np
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values > 0)]
+        indices, counts = np.unique(np.ceil(np.log(values) / self.log_gamma).astype(int), return_counts=True)
+        for index, count in zip(indices.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0.0) + count
+        self.collapse()
+
+    def collapse(self):
+        # Keep the sketch small: fold the lowest buckets together, high quantiles (slowdowns) stay accurate
+        while len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def value(self, index):
+        # Representative value of a bucket, within relative_accuracy of everything that fell into it
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q):
+        total = sum(self.buckets.values())
+        if total <= 0:
+            return float("nan")
+        rank = q * total
+        cumulative = 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative >= rank:
+                return self.value(index)
+        return self.value(max(self.buckets))
+
+    def inverse_mean(self):
+        # Mean of 1/x over the sketch, used when converting between s/it and it/s
+        total = sum(self.buckets.values())
+        if total <= 0:
+            return float("nan")
+        return sum(weight / self.value(index) for index, weight in self.buckets.items()) / total
+
+    def scale(self, factor):
+        self.buckets = {index: weight * factor for index, weight in self.buckets.items()}
+
+    def merge(self, other):
+        for index, weight in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0.0) + weight
+        self.collapse()
+
+    def invert(self):
+        # 1/x falls in bucket -index + 1 (or -index when x sits exactly on a bucket boundary)
+        self.buckets = {1 - index: weight for index, weight in self.buckets.items()}
+
+
+class NodeSummary(object):
+    # Compact, mergeable summary of one node's speeds: weighted count, mean, EWMA, min/max and a quantile sketch,
+    # stamped with the time of the last update. Older samples lose weight with an exponential half-life
+    def __init__(self, half_life=600.0, ewma_alpha=0.3, updated=None):
+        self.half_life = half_life
+        self.ewma_alpha = ewma_alpha
+        self.count = 0.0
+        self.mean = float("nan")
+        self.ewma = float("nan")
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sketch = QuantileSketch()
+        self.updated = time.time() if updated is None else updated
+
+    @classmethod
+    def from_values(cls, values, half_life=600.0, updated=None):
+        # For raw speed lists (older monitors publish those)
+        import numpy as np
+        summary = cls(half_life=half_life, updated=updated)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values):
+            summary.count = float(len(values))
+            summary.mean = float(values.mean())
+            summary.ewma = summary.mean
+            summary.min = float(values.min())
+            summary.max = float(values.max())
+            summary.sketch.add_many(values)
+        return summary
+
+    def add(self, value, now=None):
+        now = time.time() if now is None else now
+        self.decay(now)
+        self.count += 1
+        self.mean = value if self.count == 1 or math.isnan(self.mean) else self.mean + (value - self.mean) / self.count
+        self.ewma = value if math.isnan(self.ewma) else self.ewma_alpha * value + (1 - self.ewma_alpha) * self.ewma
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sketch.add(value)
+
+    def decay(self, now):
+        # Scale the weight of everything seen so far by the time elapsed since the last update. The weighted mean
+        # is unchanged by a uniform scaling, only the weight it carries against newer samples shrinks
+        factor = 0.5 ** (max(0.0, now - self.updated) / self.half_life)
+        self.count *= factor
+        self.sketch.scale(factor)
+        self.updated = max(self.updated, now)
+        return self
+
+    def merge(self, other, now=None):
+        now = time.time() if now is None else now
+        self.decay(now)
+        other = other.copy().decay(now)
+        total = self.count + other.count
+        if other.count > 0:
+            if self.count > 0 and not math.isnan(self.mean):
+                self.mean = (self.mean * self.count + other.mean * other.count) / total
+                self.ewma = (self.ewma * self.count + other.ewma * other.count) / total
+            else:
+                self.mean, self.ewma = other.mean, other.ewma
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def invert(self):
+        # Convert between s/it and it/s. The mean of 1/x is estimated from the sketch, the rest is exact
+        # (min/max) or approximate (EWMA)
+        if self.count <= 0:
+            return self
+        self.mean = self.sketch.inverse_mean()
+        self.ewma = 1 / self.ewma if self.ewma else float("inf")
+        self.min, self.max = (1 / self.max if self.max else float("inf")), (1 / self.min if self.min else float("inf"))
+        self.sketch.invert()
+        return self
+
+    def copy(self):
+        return NodeSummary.from_dict(self.to_dict(precision=None), half_life=self.half_life, ewma_alpha=self.ewma_alpha)
+
+    @property
+    def p50(self):
+        return self.sketch.quantile(0.5)
+
+    @property
+    def p95(self):
+        return self.sketch.quantile(0.95)
+
+    def to_dict(self, precision=4):
+        # Published to the aggregation directory: a few hundred bytes per node
+        def rounded(value):
+            if precision is None or not math.isfinite(value):
+                return value if math.isfinite(value) else None
+            return float(f"{value:.{precision}g}")
+
+        return {"n": rounded(self.count), "mean": rounded(self.mean), "ewma": rounded(self.ewma),
+                "min": rounded(self.min), "max": rounded(self.max), "t": self.updated,
+                "q": {str(index): rounded(weight) for index, weight in self.sketch.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data, half_life=600.0, ewma_alpha=0.3):
+        def value(key, default):
+            return default if data.get(key) is None else float(data[key])
+
+        summary = cls(half_life=half_life, ewma_alpha=ewma_alpha, updated=data["t"])
+        summary.count = value("n", 0.0)
+        summary.mean = value("mean", float("nan"))
+        summary.ewma = value("ewma", float("nan"))
+        summary.min = value("min", float("inf"))
+        summary.max = value("max", float("-inf"))
+        summary.sketch.buckets = {int(index): float(weight) for index, weight in data.get("q", {}).items()}
+        return summary
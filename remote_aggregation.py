@@ -0,0 +1,51 @@
+# Runs on the server, not locally: publishes this user's node summaries and reads every other user's file in one go.
+# Only files whose mtime changed since the caller last saw them are sent back.
+# Shipped over stdin by aggregation.AggregationStore (python3 - '<spec>'), so it must stick to the standard library.
+import glob
+import json
+import os
+import sys
+import tempfile
+
+
+def publish(directory, own_path, node_info):
+    # Write to a temporary file and rename it over the old one, so readers never see a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(node_info, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, own_path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def main(spec):
+    directory = spec["path"]
+    own_path = os.path.join(directory, spec["own_name"])
+    publish(directory, own_path, spec["node_info"])
+
+    known = spec.get("known", {})
+    files = {}
+    changed = {}
+    paths = [path for pattern in spec["patterns"] for path in glob.glob(os.path.join(directory, pattern))]
+    for path in paths:
+        if path == own_path:
+            continue
+        try:
+            mtime = os.stat(path).st_mtime
+            if known.get(path) != mtime:
+                with open(path) as f:
+                    changed[path] = json.load(f)
+        except (OSError, ValueError):
+            # Removed in the meantime, or being written by a monitor that does not write atomically
+            continue
+        files[path] = mtime
+
+    sys.stdout.write(json.dumps({"files": files, "changed": changed}))
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main(json.loads(sys.argv[1]))
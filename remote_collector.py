@@ -0,0 +1,32 @@
+# Runs on the server, not locally: gathers `runai describe job` and `runai logs` for every monitored job in one go
+# and prints one JSON object per job, so the monitor only needs a single round-trip per refresh.
+# Shipped over stdin by collector.BatchedCollector (python3 - '<spec>'), so it must stick to the standard library.
+import json
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run(command):
+    # (stdout, stderr): runai reports some errors, e.g. a job that does not exist, on stderr only
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, error = process.communicate()
+    return output.decode("latin-1"), error.decode("latin-1")
+
+
+def collect(job):
+    # describe is None when the monitor has the job's description cached
+    describe, describe_stderr = run(job["describe"]) if job["describe"] else (None, "")
+    return {"job": job["name"], "describe": describe, "describe_stderr": describe_stderr,
+            "logs": run(job["logs"])[0]}
+
+
+def main(spec):
+    with ThreadPoolExecutor(max_workers=spec.get("max_workers", 8)) as executor:
+        for result in executor.map(collect, spec["jobs"]):
+            sys.stdout.write(json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main(json.loads(sys.argv[1]))
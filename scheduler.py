@@ -0,0 +1,94 @@
+import heapq
+import time
+
+
+class PollScheduler(object):
+    # Gives every job its own next-poll deadline instead of re-polling all of them on one timer. Degrading jobs are
+    # polled more often, stable/ pending/ missing jobs back off, and a token bucket caps the remote calls per minute
+    def __init__(self, interval, fast_factor=0.25, max_factor=8.0, backoff=2.0, calls_per_minute=0):
+        self.interval = interval
+        self.min_interval = interval * fast_factor
+        self.max_interval = interval * max_factor
+        self.backoff = backoff
+        self.calls_per_minute = calls_per_minute
+        self.tokens = float(calls_per_minute)
+        self.refilled = time.time()
+        # Heap of (deadline, job); deadlines holds the current one per job, heap entries that disagree are stale
+        self.heap = []
+        self.deadlines = {}
+        self.intervals = {}
+        self.levels = {}
+
+    def sync(self, job_names, now=None):
+        # New jobs are due straight away, jobs no longer listed are forgotten
+        now = time.time() if now is None else now
+        for job_name in job_names:
+            if job_name not in self.deadlines:
+                self.schedule(job_name, now)
+        for job_name in set(self.deadlines) - set(job_names):
+            del self.deadlines[job_name]
+            self.intervals.pop(job_name, None)
+            self.levels.pop(job_name, None)
+
+    def schedule(self, job_name, deadline):
+        self.deadlines[job_name] = deadline
+        heapq.heappush(self.heap, (deadline, job_name))
+
+    def refill(self, now):
+        if self.calls_per_minute:
+            self.tokens = min(self.calls_per_minute, self.tokens + (now - self.refilled) * self.calls_per_minute / 60)
+        self.refilled = now
+
+    def spend(self, calls):
+        # Calls that are not job polls (job list, aggregation) still count against the budget
+        if self.calls_per_minute:
+            self.tokens -= calls
+
+    def due(self, cost=1, now=None):
+        # Pops the jobs whose deadline has passed, most overdue first, as far as the budget allows.
+        # Jobs left over stay due and go first on the next tick
+        now = time.time() if now is None else now
+        self.refill(now)
+        jobs = []
+        while self.heap and self.heap[0][0] <= now:
+            if self.calls_per_minute and self.tokens < cost:
+                break
+            deadline, job_name = heapq.heappop(self.heap)
+            if self.deadlines.get(job_name) != deadline:
+                continue
+            # Not due again until its result comes back and reschedules it
+            self.deadlines[job_name] = float("inf")
+            self.spend(cost)
+            jobs.append(job_name)
+        return jobs
+
+    def reschedule(self, job_name, level, now=None):
+        # level as returned by MonitorCore.classify_speed, or "error" for pending/ failed/ missing jobs
+        if job_name not in self.deadlines:
+            return
+        now = time.time() if now is None else now
+        interval = self.intervals.get(job_name, self.interval)
+        if level in ("extreme", "worrying"):
+            interval = self.min_interval
+        elif level == "error" or level == self.levels.get(job_name):
+            # Nothing to watch closely, or nothing changed since the previous poll: back off
+            interval = min(self.max_interval, max(self.interval, interval * self.backoff))
+        else:
+            interval = self.interval
+        self.intervals[job_name] = interval
+        self.levels[job_name] = level
+        self.schedule(job_name, now + interval)
+
+    def next_deadline(self, cost=1, now=None):
+        # When the next job is due, or later if the budget only allows its `cost` calls by then. None if every job
+        # is in flight
+        deadlines = [deadline for deadline in self.deadlines.values() if deadline != float("inf")]
+        if not deadlines:
+            return None
+        deadline = min(deadlines)
+        if self.calls_per_minute:
+            now = time.time() if now is None else now
+            self.refill(now)
+            if self.tokens < cost:
+                deadline = max(deadline, now + (cost - self.tokens) * 60 / self.calls_per_minute)
+        return deadline
@@ -0,0 +1,100 @@
+import re
+
+# numpy is imported where it is used (here and in the other modules of the data path), so that the window can show
+# the cached state before it has been loaded
+
+# One precompiled pattern over raw bytes: the logs never need decoding. Number and unit are captured separately so
+# converting to the logging mode does not need any string splitting
+SPEED_REGEX = re.compile(rb"([0-9]*\.[0-9]+|[0-9]+\.)(s/it|it/s)")
+# Every byte a speed match can contain. A match never spans any other byte, so data can be cut in front of a run of
+# these bytes without changing which matches are found
+SPEED_BYTES = b"0123456789.sit/"
+MAX_CARRY = 256
+# Only the last speed_history matches of each chunk are kept, so only the end of the chunk is scanned: start with
+# this many bytes and widen the window until it holds enough matches
+TAIL_WINDOW = 1 << 14
+
+
+class SpeedRing(object):
+    # Fixed-size numeric ring buffer holding the last `capacity` speeds
+    def __init__(self, capacity):
+        import numpy as np
+        self.capacity = capacity
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self.position = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def extend(self, values):
+        values = values[-self.capacity:]
+        n = len(values)
+        end = self.position + n
+        if end <= self.capacity:
+            self.values[self.position:end] = values
+        else:
+            split = self.capacity - self.position
+            self.values[self.position:] = values[:split]
+            self.values[:end - self.capacity] = values[split:]
+        self.position = end % self.capacity
+        self.count += n
+
+    def ordered(self):
+        # Oldest to newest
+        import numpy as np
+        if self.count < self.capacity:
+            return self.values[:self.count].copy()
+        return np.concatenate((self.values[self.position:], self.values[:self.position]))
+
+    def mean(self):
+        return float(self.values[:len(self)].mean())
+
+    def latest(self):
+        return float(self.values[(self.position - 1) % self.capacity])
+
+
+class StreamingSpeedParser(object):
+    # Consumes log output chunk by chunk, converts every speed to the logging mode in a single pass and only ever
+    # keeps the last speed_history values, so memory stays flat regardless of how long the job has been logging
+    def __init__(self, logging_mode="s/it", speed_history=100):
+        self.inverse_unit = b"it/s" if logging_mode == "s/it" else b"s/it"
+        self.speeds = SpeedRing(speed_history)
+        self.carry = b""
+
+    def feed(self, chunk):
+        data = self.carry + chunk
+        # Carry a trailing run of SPEED_BYTES over to the next chunk, it may be a match cut in half.
+        # Runs longer than MAX_CARRY are not tqdm output: parse them as they are
+        cut = len(data.rstrip(SPEED_BYTES))
+        if len(data) - cut > MAX_CARRY:
+            cut = len(data)
+        self.carry = data[cut:]
+        self._parse(data[:cut])
+
+    def close(self):
+        # End of stream: whatever was carried over is complete now
+        data, self.carry = self.carry, b""
+        self._parse(data)
+        return self.speeds
+
+    def _parse(self, data):
+        import numpy as np
+        window = TAIL_WINDOW
+        while True:
+            start = max(0, len(data) - window)
+            if start:
+                # Do not start scanning in the middle of a number
+                start = len(data) - len(data[start:].lstrip(SPEED_BYTES))
+            matches = SPEED_REGEX.findall(data, start)
+            if start == 0 or len(matches) >= self.speeds.capacity:
+                break
+            window *= 4
+        if not matches:
+            return
+        matches = matches[-self.speeds.capacity:]
+        values = np.array([number for number, _ in matches]).astype(np.float64)
+        inverse = np.array([unit == self.inverse_unit for _, unit in matches])
+        with np.errstate(divide="ignore"):
+            values[inverse] = 1 / values[inverse]
+        self.speeds.extend(values)
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import time
+
+
+def keyed_path(path, key):
+    # Variant of a file option for one user/ server/ cluster: state.json -> state.user@dgx1a.json
+    if not path:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{key}{extension}"
+
+
+def build_snapshot(core):
+    # JSON-serialisable view of the latest per-job and per-node state of a MonitorCore
+    jobs = {}
+    for job_name, (speed_mean, speed_latest, node, age) in core.job_details.items():
+        status, level = core.job_status[job_name]
+        jobs[job_name] = {"speed_mean": speed_mean, "speed_latest": speed_latest, "node": node, "age": age,
+                          "status": status, "level": level}
+    nodes = {}
+    for node, (mean_node_speed, status, level) in core.node_status.items():
+        # No summary for nodes that come from the state cache
+        summary = core.aggregate_summaries.get(node)
+        nodes[node] = {"mean": float(mean_node_speed), "status": status, "level": level,
+                       "summary": summary.to_dict() if summary is not None else None}
+    return {"updated_at": time.time(),
+            "last_update": core.last_update,
+            "logging_mode": core.logging_mode,
+            "job_filter": list(getattr(core, "input_job_names", None) or []),
+            "remote_aggregation": core.remote_aggregation,
+            "job_names": list(core.job_names or []),
+            "jobs": jobs,
+            "nodes": nodes}
+
+
+def apply_snapshot(target, state):
+    # Loads a snapshot into a MonitorCore or DaemonClient and reports it to its listener, as if it had been polled.
+    # Only the jobs whose state actually changed are reported
+    target.remote_aggregation = state["remote_aggregation"]
+    target.last_update = state["last_update"]
+
+    job_names = state["job_names"]
+    old_job_names = target.job_names or []
+    if job_names != old_job_names:
+        added = [job_name for job_name in job_names if job_name not in old_job_names]
+        removed = [job_name for job_name in old_job_names if job_name not in job_names]
+        for job_name in removed:
+            target.job_details.pop(job_name, None)
+            target.job_status.pop(job_name, None)
+        target.job_names = job_names
+        target.listener.on_job_list(target.job_names, added, removed)
+
+    for job_name, job in state["jobs"].items():
+        if job_name not in target.job_names:
+            continue
+        job_details = (job["speed_mean"], job["speed_latest"], job["node"], job["age"])
+        status = (job["status"], job["level"])
+        if target.job_details.get(job_name) != job_details or target.job_status.get(job_name) != status:
+            target.job_details[job_name] = job_details
+            target.job_status[job_name] = status
+            target.listener.on_job_details(job_name, job_details, status)
+
+    target.node_status = {node: (value["mean"], value["status"], value["level"])
+                          for node, value in state["nodes"].items()}
+    target.listener.on_nodes(target.node_status)
+
+
+class StateCache(object):
+    # Last known state on local disk, so that a restarted monitor can show it straight away and fill in live data
+    # as it arrives
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".state-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,87 @@
+import sys
+import time
+
+from core import MonitorListener
+
+# ANSI colour for each status level reported by MonitorCore.classify_speed
+STATUS_COLOURS = {
+    "extreme": "\x1b[1;31m",
+    "worrying": "\x1b[1;33m",
+    "normal": "\x1b[32m",
+    "excellent": "\x1b[34m",
+    "error": "\x1b[35m",
+}
+RESET = "\x1b[0m"
+CLEAR = "\x1b[H\x1b[2J"
+
+
+class TerminalView(MonitorListener):
+    # Plain ANSI renderer for headless boxes and tmux. On a terminal the screen is redrawn whenever a result comes in,
+    # otherwise (e.g. redirected to a file) one uncoloured snapshot is printed per refresh
+    def __init__(self, core, live=None):
+        self.core = core
+        self.core.listener = self
+        self.live = sys.stdout.isatty() if live is None else live
+        self.drain_interval = 0.1
+        self.dirty = False
+        self.next_refresh = 0.0
+
+    def run(self):
+        # Show the last known state (if cached) right away, live data replaces it as it comes in
+        self.core.paint_cached()
+        self.render()
+        self.core.record_startup("first paint")
+        try:
+            while True:
+                if self.next_refresh is not None and time.time() >= self.next_refresh:
+                    self.next_refresh = None
+                    self.core.start_refresh()
+                self.core.process_results()
+                if self.dirty:
+                    self.dirty = False
+                    self.render()
+                time.sleep(self.drain_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.core.close()
+
+    def on_job_list(self, job_names, added, removed):
+        self.dirty = self.dirty or self.live
+
+    def on_job_details(self, job_name, job_details, status):
+        self.dirty = self.dirty or self.live
+
+    def on_nodes(self, node_status):
+        self.dirty = self.dirty or self.live
+
+    def on_refresh_done(self):
+        self.dirty = True
+        # Schedule the next update
+        self.next_refresh = time.time() + self.core.next_refresh_delay() / 1000
+
+    def paint(self, text, level):
+        return f"{STATUS_COLOURS[level]}{text}{RESET}" if self.live else text
+
+    def render(self):
+        logging_mode = self.core.logging_mode
+        lines = [f"Last update: {self.core.last_update:.1f}s",
+                 f"Node info{' (Remote aggregation)' if self.core.remote_aggregation else ''}"]
+        for node, (mean_node_speed, node_message, level) in self.core.node_status.items():
+            lines.append("  " + self.paint(f"{node}: {node_message} ({mean_node_speed:.2f}{logging_mode})", level))
+        lines.append("")
+
+        for job_name in self.core.job_names or []:
+            if job_name not in self.core.job_details:
+                lines.append(f"{job_name}: waiting for first poll")
+                continue
+            speed_mean, speed_latest, node, age = self.core.job_details[job_name]
+            message, level = self.core.job_status[job_name]
+            if level == "error":
+                lines.append(f"{job_name}: {self.paint(message, level)}")
+            else:
+                lines.append(f"{job_name} ({age})  mean {speed_mean:.2f}{logging_mode}  "
+                             f"latest {speed_latest:.2f}{logging_mode}  {self.paint(f'{node} Status: {message}', level)}")
+
+        sys.stdout.write((CLEAR if self.live else "") + "\n".join(lines) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,24 @@
+import math
+import time
+
+from aggregation import AggregationStore
+from node_stats import NodeSummary
+
+
+def test_merge_drops_peer_nodes_decayed_away():
+    store = AggregationStore(None, "/shared", "me", half_life=600)
+    now = time.time()
+    fresh = NodeSummary(half_life=600, updated=now)
+    fresh.add(3.0, now=now)
+    stale = NodeSummary(half_life=600, updated=now - 86400)
+    for _ in range(5):
+        stale.add(60.0, now=now - 86400)
+    store.cache = {"/shared/peer_node_summary.json": (now, {"dgx1": fresh, "dgx9": stale})}
+
+    own = NodeSummary(half_life=600, updated=now)
+    own.add(1.0, now=now)
+    merged = store.merge({"dgx1": own})
+    assert set(merged) == {"dgx1"}
+    # Decayed by the few microseconds merge takes
+    assert math.isclose(merged["dgx1"].count, 2.0, rel_tol=1e-3)
+    assert math.isclose(merged["dgx1"].mean, 2.0)
@@ -0,0 +1,83 @@
+from alerts import AlertEngine, alert_level
+
+
+class ListSink(object):
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alert):
+        self.alerts.append(alert)
+
+
+def delivered(engine, sink):
+    engine.close()
+    return [(alert["name"], alert["level"], alert["state"]) for alert in sink.alerts]
+
+
+def test_error_messages_split_into_levels():
+    assert alert_level("error", "Job failed") == "failed"
+    assert alert_level("error", "Job is Pending") == "pending"
+    assert alert_level("error", "Something else") == "error"
+    assert alert_level("worrying", "Job failed") == "worrying"
+
+
+def test_hysteresis_needs_the_same_level_in_a_row():
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=2)
+    engine.observe("job", "a", "worrying", "slow", now=0)
+    engine.observe("job", "a", "normal", "ok", now=1)
+    engine.observe("job", "a", "worrying", "slow", now=2)
+    assert delivered(engine, sink) == []
+
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=2)
+    engine.observe("job", "a", "worrying", "slow", now=0)
+    engine.observe("job", "a", "worrying", "slow", now=1)
+    # Already confirmed: no new alert while the level holds
+    engine.observe("job", "a", "worrying", "slow", now=2)
+    engine.observe("job", "a", "normal", "ok", now=3)
+    engine.observe("job", "a", "normal", "ok", now=4)
+    assert delivered(engine, sink) == [("a", "worrying", "raised"), ("a", "normal", "resolved")]
+
+
+def test_cooldown_deduplicates_the_same_level():
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=1, cooldown=100)
+    for now, level in enumerate(["worrying", "normal", "worrying", "normal"]):
+        engine.observe("job", "a", level, level, now=now)
+    engine.observe("job", "a", "worrying", "slow", now=200)
+    assert delivered(engine, sink) == [("a", "worrying", "raised"), ("a", "normal", "resolved"),
+                                       ("a", "worrying", "raised")]
+
+
+def test_resolutions_deduplicated_by_the_level_they_resolve_from():
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=1, cooldown=100)
+    engine.observe("job", "a", "worrying", "slow", now=0)
+    engine.observe("job", "a", "normal", "ok", now=1)
+    engine.observe("job", "a", "extreme", "very slow", now=2)
+    engine.observe("job", "a", "normal", "ok", now=3)
+    assert delivered(engine, sink) == [("a", "worrying", "raised"), ("a", "normal", "resolved"),
+                                       ("a", "extreme", "raised"), ("a", "normal", "resolved")]
+
+
+def test_rate_limit_sums_up_suppressed_alerts():
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=1, rate=2)
+    for i in range(5):
+        engine.observe("job", f"j{i}", "failed", "Job failed", now=0)
+    # Tokens refill at `rate` per minute
+    engine.observe("job", "late", "failed", "Job failed", now=30)
+    names = delivered(engine, sink)
+    assert [name for name, _, _ in names] == ["j0", "j1", "late"]
+    assert sink.alerts[-1]["suppressed"] == 3
+    assert "3 more alerts suppressed" in sink.alerts[-1]["text"]
+
+
+def test_forgotten_jobs_start_over():
+    sink = ListSink()
+    engine = AlertEngine([sink], hysteresis=2)
+    engine.observe("job", "a", "failed", "Job failed", now=0)
+    engine.forget("job", "a")
+    engine.observe("job", "a", "failed", "Job failed", now=1)
+    assert delivered(engine, sink) == []
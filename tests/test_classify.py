@@ -0,0 +1,76 @@
+import math
+
+import pytest
+
+from classify import SpeedClassifier, parse_overrides
+
+# (speed, level) with the default optimal upper limit of 5 s/it: bounds at 5, 10 and 50 s/it, each boundary belongs
+# to the faster status
+S_PER_IT = [
+    (0.0, "excellent"),
+    (4.99, "excellent"),
+    (5.0, "excellent"),
+    (5.01, "normal"),
+    (10.0, "normal"),
+    (10.01, "worrying"),
+    (50.0, "worrying"),
+    (50.01, "extreme"),
+    (math.inf, "extreme"),
+]
+# The same bounds seen from it/s: 0.2, 0.1 and 0.02 it/s
+IT_PER_S = [
+    (10.0, "excellent"),
+    (0.2, "excellent"),
+    (0.199, "normal"),
+    (0.1, "normal"),
+    (0.099, "worrying"),
+    (0.02, "worrying"),
+    (0.0199, "extreme"),
+    (0.0, "extreme"),
+]
+
+
+@pytest.mark.parametrize("logging_mode, cases", [("s/it", S_PER_IT), ("it/s", IT_PER_S)])
+def test_classify_boundaries(logging_mode, cases):
+    classifier = SpeedClassifier(5, logging_mode)
+    for speed, level in cases:
+        message, got = classifier.classify(speed)
+        assert got == level, (speed, got)
+        assert message == classifier.messages[classifier.levels.index(level)]
+
+
+@pytest.mark.parametrize("logging_mode, cases", [("s/it", S_PER_IT), ("it/s", IT_PER_S)])
+def test_classify_many_matches_classify(logging_mode, cases):
+    classifier = SpeedClassifier(5, logging_mode)
+    speeds = [speed for speed, _ in cases]
+    assert classifier.level_names(classifier.classify_many(speeds)) == [level for _, level in cases]
+
+
+def test_overrides():
+    classifier = SpeedClassifier(5, "s/it", overrides={"dgx5*": 8, "ablation-*": 2})
+    cases = [
+        (8.0, "dgx5-amigo", "excellent"),
+        (8.0, "dgx1-amigo", "normal"),
+        (3.0, "ablation-lr", "normal"),
+        (3.0, "run-lr", "excellent"),
+        (80.0, "dgx5-amigo", "worrying"),
+        (8.0, None, "normal"),
+    ]
+    for speed, name, level in cases:
+        assert classifier.classify(speed, name)[1] == level, (speed, name)
+    indices = classifier.classify_many([speed for speed, _, _ in cases], [name for _, name, _ in cases])
+    assert classifier.level_names(indices) == [level for _, _, level in cases]
+
+
+def test_overrides_in_it_per_s():
+    # Limits stay in s/it whatever the logging mode
+    classifier = SpeedClassifier(5, "it/s", overrides={"dgx5*": 8})
+    assert classifier.classify(1 / 8, "dgx5-amigo")[1] == "excellent"
+    assert classifier.classify(1 / 8, "dgx1-amigo")[1] == "normal"
+
+
+def test_parse_overrides():
+    assert parse_overrides(["dgx5*=8", "a=b=2"]) == {"dgx5*": 8.0, "a=b": 2.0}
+    assert parse_overrides(None) == {}
+    with pytest.raises(ValueError):
+        parse_overrides(["8"])
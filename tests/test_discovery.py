@@ -0,0 +1,60 @@
+from discovery import JobDiscovery, compile_filter, is_pattern
+
+HEADER = "NAME STATUS AGE NODE IMAGE"
+
+
+class ListingTransport(object):
+    # Answers `runai list` with the next listing
+    def __init__(self, *listings):
+        self.listings = list(listings)
+
+    def run(self, command, input=None, label=None, timeout=None):
+        assert command == "runai list"
+        return self.listings.pop(0).encode("latin-1")
+
+
+def listing(*lines):
+    return "\n".join(("Showing jobs for project me", HEADER) + lines) + "\n"
+
+
+def test_compile_filter():
+    assert compile_filter(None)("anything")
+    matches = compile_filter(["job-*", "re:^run-[0-9]+$", "exact"])
+    assert matches("job-1")
+    assert not matches("my-job-1")
+    assert matches("run-12")
+    assert not matches("run-12a")
+    assert matches("exact")
+    assert not matches("exactly")
+    # Regular expressions match anywhere in the name
+    assert compile_filter(["re:train"])("my-training-job")
+
+
+def test_is_pattern():
+    assert is_pattern("job-*")
+    assert is_pattern("run-?")
+    assert is_pattern("re:run")
+    assert not is_pattern("job-1")
+
+
+def test_parse_skips_header_and_excluded_jobs():
+    discovery = JobDiscovery(None, ["job-*", "inf-*"])
+    jobs = discovery.parse(listing("job-1 Running 1h dgx1 img", "inf-job Running 1h dgx2 img",
+                                   "other Running 1h dgx1 img", "job-2 Pending 1m", ""))
+    assert jobs == {"job-1": ("Running", "dgx1"), "job-2": ("Pending", None)}
+
+
+def test_poll_reports_deltas():
+    transport = ListingTransport(
+        listing("a Running 1h dgx1 img", "b Pending 1m"),
+        listing("a Running 1h dgx1 img", "b Running 2m dgx2 img", "c Running 1m dgx3 img"),
+        listing("c Pending 2m", "b Running 3m dgx2 img"),
+    )
+    discovery = JobDiscovery(transport)
+
+    assert discovery.poll() == (["a"], ["a", "b"], [], {})
+    assert discovery.poll() == (["a", "b", "c"], ["c"], [], {"b": ("Running", "dgx2")})
+    running, added, removed, changed = discovery.poll()
+    assert (running, added, removed, changed) == (["b"], [], ["a"], {"c": ("Pending", None)})
+    # Known jobs keep the order they were first seen in
+    assert list(discovery.jobs) == ["b", "c"]
@@ -0,0 +1,55 @@
+from log_tail import IncrementalLogReader, timestamp_key
+
+
+def logs(*lines):
+    return "".join(f"{timestamp} {text}\n" for timestamp, text in lines).encode("latin-1")
+
+
+def test_timestamp_key_pads_fraction():
+    assert timestamp_key("2024-05-01T10:00:00.5Z") > timestamp_key("2024-05-01T10:00:00.123456789Z")
+    assert timestamp_key("2024-05-01T10:00:00.5Z") == timestamp_key("2024-05-01T10:00:00.500000000Z")
+    assert timestamp_key("2024-05-01T10:00:00Z") < timestamp_key("2024-05-01T10:00:00.1Z")
+
+
+def test_since_time_overlap_is_skipped():
+    reader = IncrementalLogReader(None, speed_history=10)
+    first = logs(("2024-05-01T10:00:00.1Z", "1.00s/it"), ("2024-05-01T10:00:00.2Z", "2.00s/it"))
+    assert reader.ingest("job", first).ordered().tolist() == [1.0, 2.0]
+    assert reader.log_command("job") == "runai logs job --timestamps --since-time 2024-05-01T10:00:00.2Z"
+
+    # --since-time is inclusive: the line at the cursor comes back and must not be counted twice
+    second = logs(("2024-05-01T10:00:00.2Z", "2.00s/it"), ("2024-05-01T10:00:00.25Z", "3.00s/it"))
+    assert reader.ingest("job", second).ordered().tolist() == [1.0, 2.0, 3.0]
+    assert "job" not in reader.quiet
+
+
+def test_quiet_polls_are_counted():
+    reader = IncrementalLogReader(None, speed_history=10)
+    line = logs(("2024-05-01T10:00:00.1Z", "1.00s/it"))
+    reader.ingest("job", line)
+    reader.ingest("job", line)
+    reader.ingest("job", b"")
+    assert reader.quiet["job"][1] == 2
+    reader.ingest("job", logs(("2024-05-01T10:00:01Z", "1.00s/it")))
+    assert "job" not in reader.quiet
+
+
+def test_reset_starts_from_tail():
+    reader = IncrementalLogReader(None, speed_history=10, initial_tail=50)
+    reader.ingest("job", logs(("2024-05-01T10:00:00Z", "1.00s/it")))
+    reader.reset("job")
+    assert reader.log_command("job") == "runai logs job --timestamps --tail 50"
+    assert reader.state("job") is None
+
+
+def test_only_timestamped_lines_move_the_cursor():
+    reader = IncrementalLogReader(None, speed_history=10)
+    reader.ingest("job", logs(("2024-05-01T10:00:00.1Z", "1.00s/it")))
+    job_logs = logs(("Error", "from server (BadRequest): container is waiting to start"),
+                    ("2024-05-01T10:00:01Z", "2.00s/it"), ("unable", "to retrieve container logs"))
+    assert reader.ingest("job", job_logs).ordered().tolist() == [1.0, 2.0]
+    assert reader.log_command("job") == "runai logs job --timestamps --since-time 2024-05-01T10:00:01Z"
+
+    reader.ingest("job", logs(("Error", "from server: 2.00s/it")))
+    assert reader.cursors["job"] == "2024-05-01T10:00:01Z"
+    assert reader.quiet["job"][1] == 1
@@ -0,0 +1,43 @@
+from metadata import JobMetadata, MetadataCache, format_age, parse_age, quiet_since_described
+
+
+def test_age_round_trip():
+    assert parse_age("2d3h") == 2 * 86400 + 3 * 3600
+    assert parse_age("45s") == 45
+    assert parse_age("soon") is None
+    assert format_age(2 * 86400 + 3 * 3600 + 59) == "2d3h"
+    assert format_age(125) == "2m"
+    assert JobMetadata("pod", "dgx1", None, "1h12m", fetched=0).current_age(now=60) == "1h13m"
+
+
+def test_entries_expire_after_max_age():
+    cache = MetadataCache(max_age=600)
+    metadata = JobMetadata("pod", "dgx1", None, "5m", fetched=0)
+    assert cache.put("job", metadata) is None
+    assert cache.get("job", now=600) is metadata
+    assert cache.get("job", now=601) is None
+
+
+def test_invalidate_keeps_the_previous_pod():
+    cache = MetadataCache()
+    metadata = JobMetadata("pod", "dgx1", None, "5m", fetched=0)
+    cache.put("job", metadata)
+    cache.invalidate("job")
+    assert cache.get("job", now=1) is None
+    # Still known, so the next describe can tell whether the pod changed
+    assert cache.put("job", JobMetadata("pod-2", "dgx2", None, "1s", fetched=1)) is metadata
+    cache.forget("job")
+    assert cache.get("job", now=1) is None
+    assert cache.entries == {}
+
+
+def test_quiet_stretch_needs_polls_time_and_a_describe_before_it():
+    metadata = JobMetadata("pod", "dgx1", None, "5m", fetched=100)
+    assert not quiet_since_described(metadata, None, 3, 30, now=1000)
+    # Not enough quiet polls, or not quiet for long enough
+    assert not quiet_since_described(metadata, (200, 2), 3, 30, now=1000)
+    assert not quiet_since_described(metadata, (200, 3), 3, 30, now=220)
+    assert quiet_since_described(metadata, (200, 3), 3, 30, now=230)
+    # Already described again during this quiet stretch: only once per stretch
+    described = JobMetadata("pod", "dgx1", None, "5m", fetched=250)
+    assert not quiet_since_described(described, (200, 10), 3, 30, now=1000)
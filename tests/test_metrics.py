@@ -0,0 +1,26 @@
+from metrics import Metrics
+
+
+def test_prometheus_families_are_contiguous():
+    metrics = Metrics()
+    metrics.record("parse logs", 0.1)
+    metrics.record("runai logs", 2.0, False, bytes_in=10, bytes_out=5, kind="remote")
+    families = []
+    for line in metrics.to_prometheus().splitlines():
+        if line.startswith("# TYPE "):
+            families.append(line.split()[2])
+        else:
+            assert line.startswith(families[-1])
+    assert families == ["runai_monitor_stage_seconds", "runai_monitor_stage_errors_total",
+                        "runai_monitor_stage_bytes_total"]
+
+
+def test_prometheus_histogram_is_cumulative():
+    metrics = Metrics()
+    for elapsed in (0.001, 0.001, 100):
+        metrics.record("stage", elapsed)
+    lines = metrics.to_prometheus().splitlines()
+    buckets = [int(line.split()[-1]) for line in lines if "_bucket{" in line]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 3
+    assert 'runai_monitor_stage_seconds_count{stage="stage",kind="local"} 3' in lines
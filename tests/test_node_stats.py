@@ -0,0 +1,72 @@
+import math
+
+from node_stats import NodeSummary, QuantileSketch
+
+
+def test_sketch_invert_maps_buckets():
+    sketch = QuantileSketch()
+    values = [0.013, 0.7, 1.3, 2.9, 17.0, 420.0]
+    for value in values:
+        sketch.add(value)
+    sketch.invert()
+
+    inverted = QuantileSketch()
+    for value in values:
+        inverted.add(1 / value)
+    assert sketch.buckets == inverted.buckets
+
+
+def test_sketch_quantiles_within_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.05)
+    values = [float(i) for i in range(1, 1001)]
+    for value in values:
+        sketch.add(value)
+    for q in (0.1, 0.5, 0.95):
+        expected = values[math.ceil(q * len(values)) - 1]
+        assert abs(sketch.quantile(q) - expected) <= 0.05 * expected
+
+
+def test_sketch_ignores_non_positive():
+    sketch = QuantileSketch()
+    for value in (0.0, -1.0, math.inf, math.nan):
+        sketch.add(value)
+    assert sketch.buckets == {}
+    assert math.isnan(sketch.quantile(0.5))
+
+
+def test_decay_halves_weight_keeps_mean():
+    summary = NodeSummary(half_life=10, updated=0)
+    for value in (2.0, 4.0):
+        summary.add(value, now=0)
+    summary.decay(10)
+    assert summary.count == 1.0
+    assert summary.mean == 3.0
+
+
+def test_merge_weights_by_decayed_count():
+    old = NodeSummary(half_life=10, updated=0)
+    old.add(10.0, now=0)
+    new = NodeSummary(half_life=10, updated=10)
+    new.add(1.0, now=10)
+    merged = new.merge(old, now=10)
+    # The old sample counts half
+    assert merged.count == 1.5
+    assert math.isclose(merged.mean, (1.0 + 0.5 * 10.0) / 1.5)
+    assert (merged.min, merged.max) == (1.0, 10.0)
+
+
+def test_invert_summary():
+    summary = NodeSummary(updated=0)
+    for value in (2.0, 4.0):
+        summary.add(value, now=0)
+    summary.invert()
+    assert (summary.min, summary.max) == (0.25, 0.5)
+    assert abs(summary.mean - 0.375) <= 0.05 * 0.375
+
+
+def test_dict_round_trip():
+    summary = NodeSummary(updated=5)
+    for value in (1.5, 2.5, 3.5):
+        summary.add(value, now=5)
+    copy = NodeSummary.from_dict(summary.to_dict(precision=None))
+    assert copy.to_dict(precision=None) == summary.to_dict(precision=None)
@@ -0,0 +1,72 @@
+from scheduler import PollScheduler
+
+
+def test_new_jobs_are_due_at_once():
+    scheduler = PollScheduler(10)
+    scheduler.sync(["a", "b"], now=0)
+    assert sorted(scheduler.due(now=0)) == ["a", "b"]
+    # Not due again until rescheduled
+    assert scheduler.due(now=100) == []
+
+
+def test_degrading_jobs_polled_faster_stable_ones_back_off():
+    scheduler = PollScheduler(10, fast_factor=0.25, max_factor=8, backoff=2)
+    scheduler.sync(["a", "b"], now=0)
+    scheduler.due(now=0)
+    scheduler.reschedule("a", "worrying", now=0)
+    scheduler.reschedule("b", "normal", now=0)
+    assert scheduler.deadlines == {"a": 2.5, "b": 10}
+
+    # Same level again: the interval doubles, up to max_factor times the base interval
+    intervals = []
+    now = 10
+    for _ in range(5):
+        scheduler.reschedule("b", "normal", now=now)
+        intervals.append(scheduler.intervals["b"])
+        now += intervals[-1]
+    assert intervals == [20, 40, 80, 80, 80]
+
+    # A status change resets to the base interval
+    scheduler.reschedule("b", "excellent", now=now)
+    assert scheduler.intervals["b"] == 10
+
+
+def test_errors_back_off():
+    scheduler = PollScheduler(10, max_factor=4)
+    scheduler.sync(["a"], now=0)
+    for _ in range(4):
+        scheduler.reschedule("a", "error", now=0)
+    assert scheduler.intervals["a"] == 40
+
+
+def test_budget_limits_due_jobs():
+    scheduler = PollScheduler(10, calls_per_minute=4)
+    scheduler.sync(["a", "b", "c"], now=scheduler.refilled)
+    now = scheduler.refilled
+    assert len(scheduler.due(cost=2, now=now)) == 2
+    # Left over jobs stay due, and go out once the budget has refilled (2 calls take 30 s at 4 per minute)
+    assert scheduler.due(cost=2, now=now + 1) == []
+    assert scheduler.due(cost=2, now=now + 31) == ["c"]
+
+
+def test_sync_forgets_removed_jobs():
+    scheduler = PollScheduler(10)
+    scheduler.sync(["a", "b"], now=0)
+    scheduler.sync(["b"], now=0)
+    assert scheduler.due(now=0) == ["b"]
+
+
+def test_next_deadline_skips_jobs_in_flight_and_waits_for_budget():
+    scheduler = PollScheduler(10, calls_per_minute=60)
+    scheduler.refilled = 0
+    scheduler.sync(["a", "b"], now=0)
+    assert scheduler.next_deadline(now=0) == 0
+    assert sorted(scheduler.due(cost=2, now=0)) == ["a", "b"]
+    assert scheduler.next_deadline(now=0) is None
+
+    scheduler.reschedule("a", "normal", now=1)
+    assert scheduler.next_deadline(now=1) == 11
+    # Budget spent: a job due now has to wait for its calls to be refilled, one per second
+    scheduler.tokens = 0
+    scheduler.refilled = 20
+    assert scheduler.next_deadline(cost=2, now=20) == 22
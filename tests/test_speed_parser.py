@@ -0,0 +1,41 @@
+import pytest
+
+from speed_parser import SpeedRing, StreamingSpeedParser
+
+LOG = (b"epoch 1:  10%|#    | 10/100 [00:10<01:30,  1.25s/it]\r"
+       b"epoch 1:  11%|#    | 11/100 [00:11<01:29,  0.50it/s]\n"
+       b"loss 0.123 lr 3.\n"
+       b"epoch 1:  12%|#    | 12/100 [00:12<01:28,  .75s/it]\n") * 20
+
+
+def parse(chunks, logging_mode="s/it", speed_history=100):
+    parser = StreamingSpeedParser(logging_mode, speed_history)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close().ordered().tolist()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, len(LOG)])
+def test_chunking_does_not_change_matches(chunk_size):
+    chunks = [LOG[i:i + chunk_size] for i in range(0, len(LOG), chunk_size)]
+    assert parse(chunks) == parse([LOG])
+
+
+def test_units_converted_to_logging_mode():
+    assert parse([LOG], speed_history=3) == [1.25, 2.0, 0.75]
+    assert parse([LOG], "it/s", speed_history=3) == [0.8, 0.5, 1 / 0.75]
+
+
+def test_keeps_last_speed_history():
+    speeds = parse([b"".join(f"{i}.0s/it\n".encode() for i in range(1, 1001))], speed_history=5)
+    assert speeds == [996.0, 997.0, 998.0, 999.0, 1000.0]
+
+
+def test_ring_wraps_in_order():
+    import numpy as np
+    ring = SpeedRing(4)
+    ring.extend(np.array([1.0, 2.0, 3.0]))
+    ring.extend(np.array([4.0, 5.0]))
+    assert ring.ordered().tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert ring.latest() == 5.0
+    assert len(ring) == 4
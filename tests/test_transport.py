@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from transport import LocalTransport, RemoteCancelled, RemoteError, RemoteTimeout, Transport
+
+
+def test_output_is_returned():
+    transport = LocalTransport(retries=0)
+    assert transport.run("echo hello") == b"hello\n"
+    # Output from a command that fails for good is still used
+    assert transport.run("echo partial; exit 1") == b"partial\n"
+    assert transport.metrics.stages["echo"].count == 2
+
+
+def test_non_transient_failures_are_not_retried(tmp_path):
+    attempts = tmp_path / "attempts"
+    transport = LocalTransport(retries=2, backoff=0.01)
+    with pytest.raises(RemoteError) as error:
+        transport.run(f"echo x >> {attempts}; echo broken >&2; exit 3")
+    assert error.value.returncode == 3
+    assert error.value.stderr == "broken"
+    assert attempts.read_text().count("x") == 1
+
+
+def test_transient_failures_are_retried(tmp_path):
+    attempts = tmp_path / "attempts"
+    transport = LocalTransport(retries=2, backoff=0.01)
+    # Killed by a signal on the first two attempts, succeeds on the third
+    command = (f"echo x >> {attempts}; "
+               f"if [ $(wc -l < {attempts}) -lt 3 ]; then kill -9 $$; fi; echo done")
+    assert transport.run(command) == b"done\n"
+    assert attempts.read_text().count("x") == 3
+
+    attempts.write_text("")
+    transport = LocalTransport(retries=1, backoff=0.01)
+    with pytest.raises(RemoteError) as error:
+        transport.run(f"echo x >> {attempts}; kill -9 $$")
+    assert error.value.returncode == -9
+    assert attempts.read_text().count("x") == 2
+
+
+def test_timeout_kills_the_call():
+    transport = LocalTransport(retries=1, backoff=0.01)
+    start = time.time()
+    with pytest.raises(RemoteTimeout):
+        transport.run("sleep 10", timeout=0.2)
+    assert time.time() - start < 5
+    assert transport.processes == set()
+    assert transport.metrics.stages["sleep"].count == 2
+
+
+def test_cancel_stops_calls_in_flight_and_their_retries():
+    transport = LocalTransport(retries=5, backoff=10)
+    errors = []
+
+    def call():
+        try:
+            transport.run("sleep 10")
+        except RemoteError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=call)
+    start = time.time()
+    thread.start()
+    while not transport.processes:
+        time.sleep(0.01)
+    transport.cancel()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert time.time() - start < 5
+    assert len(errors) == 1 and isinstance(errors[0], RemoteCancelled)
+
+
+def test_command_label():
+    assert Transport.command_label("runai describe job x") == "runai describe"
+    assert Transport.command_label("cat /tmp/file") == "cat"
+    assert Transport.command_label("") == ""
@@ -0,0 +1,255 @@
+import os
+import random
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from metrics import Metrics
+
+
+class RemoteError(Exception):
+    # A remote call that failed without any output, timed out or was cancelled
+    def __init__(self, message, returncode=None, stderr=""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class RemoteTimeout(RemoteError):
+    pass
+
+
+class RemoteCancelled(RemoteError):
+    pass
+
+
+def kill(process):
+    # The whole process group: with shell=True killing the shell alone would leave its children holding the pipes
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class Transport(object):
+    # Base class for everything that runs a shell command "on the server" and returns its stdout as bytes
+    # Subclasses only need to implement _execute(command, input, timeout) -> (returncode, stdout, stderr), raising
+    # subprocess.TimeoutExpired past the timeout. Every call has a deadline, calls that time out or hit a transient
+    # failure are retried with jittered exponential backoff, and cancel() kills whatever is in flight
+    def __init__(self, metrics=None, timeout=60, retries=2, backoff=1.0):
+        # Every call is timed and counted here, the core adds its local stages to the same registry
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # Live subprocesses, and a counter bumped by every cancel() so that calls started before it give up
+        self.processes = set()
+        self.generation = 0
+        self._cancelled = threading.Condition()
+
+    def run(self, command, input=None, label=None, timeout=None):
+        label = label or self.command_label(command)
+        timeout = self.timeout if timeout is None else timeout
+        generation = self.generation
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                returncode, output, stderr = self._execute(command, input, timeout)
+            except subprocess.TimeoutExpired:
+                self.record(label, time.perf_counter() - start, False, bytes_out=len(command) + len(input or b""))
+                error = RemoteTimeout(f"{label} timed out after {timeout:g}s")
+            else:
+                self.record(label, time.perf_counter() - start, returncode == 0,
+                            bytes_in=len(output), bytes_out=len(command) + len(input or b""))
+                if returncode == 0 or (output and not self.transient(returncode)):
+                    return output
+                stderr = stderr.decode("latin-1").strip()
+                reason = stderr.splitlines()[-1] if stderr else "no output"
+                error = RemoteError(f"{label} failed ({returncode}): {reason}", returncode, stderr)
+                if not self.transient(returncode):
+                    raise error
+            if attempt == self.retries or not self.wait(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5),
+                                                        generation):
+                break
+        if generation != self.generation:
+            raise RemoteCancelled(f"{label} cancelled")
+        raise error
+
+    def stream(self, command, chunk_size=1 << 20, label=None, timeout=None):
+        # Yields stdout chunk by chunk instead of buffering it whole, for outputs that can be very large.
+        # The deadline covers the whole download: past it the process is killed and RemoteTimeout raised
+        label = label or self.command_label(command)
+        timeout = self.timeout if timeout is None else timeout
+        generation = self.generation
+        process = self._spawn(command)
+        if process is None:
+            yield self.run(command, label=label, timeout=timeout)
+            return
+        self.processes.add(process)
+        watchdog = threading.Timer(timeout, kill, (process,))
+        watchdog.start()
+        start = time.perf_counter()
+        received = 0
+        ok = False
+        try:
+            for chunk in iter(lambda: process.stdout.read(chunk_size), b""):
+                received += len(chunk)
+                yield chunk
+            ok = process.wait() == 0
+            if generation != self.generation:
+                raise RemoteCancelled(f"{label} cancelled")
+            if not watchdog.is_alive():
+                raise RemoteTimeout(f"{label} timed out after {timeout:g}s")
+        finally:
+            watchdog.cancel()
+            kill(process)
+            process.stdout.close()
+            process.wait()
+            self.processes.discard(process)
+            self.record(label, time.perf_counter() - start, ok, bytes_in=received, bytes_out=len(command))
+
+    def communicate(self, args, input=None, timeout=None, shell=False):
+        # subprocess.run, but registered so that cancel() can kill it. stderr is kept for the error message
+        process = subprocess.Popen(args, shell=shell, stdin=subprocess.PIPE if input is not None else None,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        self.processes.add(process)
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill(process)
+            process.communicate()
+            raise
+        finally:
+            self.processes.discard(process)
+        return process.returncode, stdout, stderr
+
+    def cancel(self):
+        # Kill every call in flight (they raise RemoteCancelled) and stop their retries
+        with self._cancelled:
+            self.generation += 1
+            self._cancelled.notify_all()
+        for process in list(self.processes):
+            kill(process)
+
+    def wait(self, delay, generation):
+        # Backoff sleep, cut short by cancel(). Returns False if cancelled
+        with self._cancelled:
+            return not self._cancelled.wait_for(lambda: self.generation != generation, timeout=delay)
+
+    def transient(self, returncode):
+        # Failures worth retrying
+        return returncode < 0
+
+    def record(self, label, elapsed, ok=True, bytes_in=0, bytes_out=0):
+        self.metrics.record(label, elapsed, ok, bytes_in, bytes_out, kind="remote")
+
+    @staticmethod
+    def command_label(command):
+        # Group counters by command "verb", e.g. "runai describe", "runai logs", "ls", "cat"
+        tokens = command.split()
+        if not tokens:
+            return ""
+        if tokens[0] == "runai":
+            return " ".join(tokens[:2])
+        return tokens[0]
+
+    def latency_summary(self):
+        return self.metrics.summary(kind="remote")
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _execute(self, command, input=None, timeout=None):
+        raise NotImplementedError
+
+    def _spawn(self, command):
+        # Subprocess-based transports return a Popen with stdout=PIPE so stream() can read it incrementally
+        return None
+
+
+class LocalTransport(Transport):
+    # Runs commands directly, e.g. when the monitor itself runs on the login node
+    def _execute(self, command, input=None, timeout=None):
+        return self.communicate(command, input, timeout, shell=True)
+
+    def _spawn(self, command):
+        return subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                start_new_session=True)
+
+
+class SSHTransport(Transport):
+    # Multiplexes every call over a single long-lived ssh connection (ControlMaster), so only the first call
+    # pays for the full handshake. The master is kept alive for control_persist after the last client exits
+    def __init__(self, username, server_address, control_persist="10m", control_dir=None, connect_timeout=10,
+                 **options):
+        super().__init__(**options)
+        self.destination = f"{username}@{server_address}"
+        self.control_persist = control_persist
+        # %C is a hash of local host, remote host, port and user: keeps the socket path short and unique
+        self.control_path = os.path.join(control_dir or tempfile.gettempdir(), "runai-monitor-%C")
+        self.connect_timeout = connect_timeout
+
+    def ssh_options(self):
+        return ["-o", "ControlMaster=auto",
+                "-o", f"ControlPath={self.control_path}",
+                "-o", f"ControlPersist={self.control_persist}",
+                "-o", f"ConnectTimeout={self.connect_timeout}",
+                "-o", "ServerAliveInterval=30",
+                "-o", "ServerAliveCountMax=3"]
+
+    def _execute(self, command, input=None, timeout=None):
+        returncode, stdout, stderr = self.communicate(["ssh", *self.ssh_options(), self.destination, command],
+                                                      input, timeout)
+        if returncode == 255 and not self.master_alive():
+            # 255 is ssh's own failure code, but also what a remote command or a single session may exit with. Only
+            # a dead master is dropped (other calls share it), the retry then reconnects
+            self.reset()
+        return returncode, stdout, stderr
+
+    def transient(self, returncode):
+        return returncode == 255 or super().transient(returncode)
+
+    def _spawn(self, command):
+        return subprocess.Popen(["ssh", *self.ssh_options(), self.destination, command],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    def connect(self):
+        # Establish the master up front so concurrent first calls do not race to create it. Best effort: if the
+        # server cannot be reached now, the first polls retry (with backoff) and their jobs show as failed/ stale
+        try:
+            self.run("true", label="connect")
+        except RemoteError as e:
+            print(f"Could not connect to {self.destination} ({e}), retrying on the next refresh")
+
+    def master_alive(self):
+        # The master answers on its control socket
+        try:
+            return subprocess.run(["ssh", *self.ssh_options(), "-O", "check", self.destination],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  timeout=self.connect_timeout).returncode == 0
+        except subprocess.TimeoutExpired:
+            return False
+
+    def reset(self):
+        subprocess.run(["ssh", *self.ssh_options(), "-O", "exit", self.destination],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=self.connect_timeout)
+
+    def close(self):
+        self.reset()
+
+
+def make_transport(kind, username, server_address, timeout=60, retries=2):
+    if kind == "ssh":
+        return SSHTransport(username, server_address, timeout=timeout, retries=retries)
+    elif kind == "local":
+        return LocalTransport(timeout=timeout, retries=retries)
+    elif kind == "fake":
+        # Simulated cluster, for trying things out without a server
+        from fake_runai import FakeTransport
+        return FakeTransport(timeout=timeout, retries=retries)
+    raise ValueError(f"Unknown transport: {kind}")